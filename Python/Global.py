@@ -1,4 +1,9 @@
 import os
+import io
+import json
+import codecs
+import shutil
+import re
 from scipy.io import arff
 import pandas as pd
 import numpy as np
@@ -27,7 +32,7 @@ def loadarfftoDataframe(file_path, encoding='utf-8-sig', nRows=None):
     try:
         data, meta = arff.loadarff(file_path)
         # Convert the structured array to a Pandas DataFrame
-        dataframe1 = pd.DataFrame.from_records(data,nRows=nRows)
+        dataframe1 = pd.DataFrame.from_records(data,nrows=nRows)
 
         # Decode categorical attributes to strings
         for column in dataframe1.columns:
@@ -39,7 +44,96 @@ def loadarfftoDataframe(file_path, encoding='utf-8-sig', nRows=None):
     except arff.ParseArffError as e:
         return None
     
-def readDataset(filepath, sep=';', encoding='utf-8-sig', hasHeader=True, nRows=None):
+#The attribute line of an arff header: @attribute <name> <type>. The name may be quoted
+arffAttributePattern=re.compile(r"""^@attribute\s+('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|\S+)\s+(.*)$""", re.IGNORECASE)
+
+def readArffHeader(file_path, encoding='utf-8-sig'):
+    #Returns (attributes, dataLine) of an arff file or None. attributes are (name, type) pairs, the type
+    #is 'numeric', 'nominal', 'string' or 'date' (only the numeric ones are parsed as numbers), and
+    #dataLine is the number of lines before the first data line
+    attributes=[]
+    with open(file=file_path, mode='r', encoding=encoding) as file:
+        for lineNo, line in enumerate(file):
+            line=line.strip()
+            if not line or line.startswith('%'):
+                continue
+            if line.lower().startswith('@data'):
+                return attributes, lineNo+1
+            match=arffAttributePattern.match(line)
+            if match is None:
+                continue
+            name, attrType=match.group(1), match.group(2).strip()
+            if name[0] in '\'"':
+                name=name[1:-1]
+            if attrType.startswith('{'):
+                attributes.append((name, 'nominal'))
+            elif attrType.lower() in ('numeric', 'real', 'integer'):
+                attributes.append((name, 'numeric'))
+            elif attrType.lower().startswith('date'):
+                attributes.append((name, 'date'))
+            else:
+                attributes.append((name, 'string'))
+    return None
+
+def readArff(file_path, encoding='utf-8-sig', nRows=None, chunkSize=None, usecols=None):
+    #Reads the data of an arff file as loadarfftoDataframe does (numeric attributes as float64 with
+    #NaN for '?', the others as text) with the pandas parser and the types of the header, so only
+    #nRows lines are parsed. chunkSize returns an iterator of DataFrames of up to chunkSize rows.
+    #Only the whole lines starting with % are comments (a % in a value is kept). Returns None for a
+    #sparse arff file, data quoted with both ' and " or an unreadable file, which loadarff reads
+    header=readArffHeader(file_path, encoding)
+    if header is None or len(header[0])==0:
+        return None
+    attributes, dataLine=header
+
+    #the lines before the data, the comment lines and the quote characters of the data lines that are read
+    skipRows=set(range(dataLine))
+    quotes=set()
+    dataRows=0
+    with open(file=file_path, mode='r', encoding=encoding) as file:
+        for lineNo, line in enumerate(islice(file, dataLine, None), dataLine):
+            line=line.strip()
+            if not line:
+                continue
+            if line.startswith('%'):
+                skipRows.add(lineNo)
+                continue
+            if dataRows==0 and line.startswith('{'):
+                return None
+            quotes.update(x for x in '"\'' if x in line)
+            dataRows+=1
+            if nRows is not None and dataRows>=nRows:
+                break
+    if len(quotes)>1:
+        return None
+
+    names=[name for name, _ in attributes]
+    dtype={name: 'float64' if attrType=='numeric' else 'str' for name, attrType in attributes}
+    numeric=[name for name, attrType in attributes if attrType=='numeric']
+    options=dict(sep=',', header=None, names=names, dtype=dtype, usecols=usecols, nrows=nRows,
+                 skiprows=skipRows, skipinitialspace=True, quotechar=quotes.pop() if quotes else '"',
+                 escapechar='\\', keep_default_na=False, na_values={name: ['?'] for name in numeric},
+                 encoding=encoding, skip_blank_lines=True, float_precision='round_trip')
+    try:
+        if chunkSize:
+            return pd.read_csv(file_path, chunksize=chunkSize, **options)
+        return pd.read_csv(file_path, **options)
+    except Exception:
+        return None
+
+def readDataset(filepath, sep=';', encoding='utf-8-sig', hasHeader=True, nRows=None, chunkSize=None, usecols=None, dtype=None):
+    #chunkSize streams the dataset as an iterator of DataFrames of up to chunkSize rows
+    if chunkSize:
+        return readDatasetChunks(filepath, sep=sep, encoding=encoding, hasHeader=hasHeader, nRows=nRows, chunkSize=chunkSize, usecols=usecols, dtype=dtype)
+
+    #usecols prunes the columns read from the columnar store or by pandas. The other readers return all the columns.
+    #The dtypes of the store are inferred from the whole file, pandas infers the ones of the first nRows rows
+    #from these rows only, so the store serves only the full reads
+    if nRows is None:
+        dataset=readColumnStore(filepath, sep=sep, encoding=encoding, hasHeader=hasHeader, usecols=usecols)
+        if isinstance(dataset, pd.DataFrame):
+            return dataset
+
     dataset=None
     try:
 
@@ -48,10 +142,12 @@ def readDataset(filepath, sep=';', encoding='utf-8-sig', hasHeader=True, nRows=N
             headerV1=0
 
         if is_arff_file(filepath):
-            dataset=loadarfftoDataframe(filepath, encoding)
+            dataset=readArff(filepath, encoding, nRows=nRows, usecols=usecols)
+            if not isinstance(dataset, pd.DataFrame):
+                dataset=loadarfftoDataframe(filepath, encoding, nRows=nRows)
         if not isinstance(dataset, pd.DataFrame):
             try:
-                dataset = pd.read_csv(filepath, sep=sep, encoding=encoding, header=headerV1, nrows=nRows)
+                dataset = pd.read_csv(filepath, sep=sep, encoding=encoding, header=headerV1, nrows=nRows, usecols=usecols, dtype=dtype)
             except Exception:
                 with open(filepath, mode='r') as file:
                     reader = csv.reader(file, delimiter=sep)
@@ -72,7 +168,246 @@ def readDataset(filepath, sep=';', encoding='utf-8-sig', hasHeader=True, nRows=N
     finally:
         return dataset       
 
-def countDatasetRecords(filepath):
-    with open(filepath, 'r', encoding='utf-8-sig') as file:
-        line_count = sum(1 for line in file)
+def readDatasetSample(filepath, nLines, encoding='utf-8-sig', blockSize=64*1024):
+    #The list of the first nLines lines of the dataset, as the readline calls return them (\r\n and \r
+    #end a line as \n). A single byte buffer is read in blocks until it holds nLines line breaks
+    buffer=bytearray()
+    newlines=0
+    returns=0
+    eof=False
+    with open(filepath, 'rb') as file:
+        while newlines<nLines and returns<=nLines:
+            block=file.read(blockSize)
+            if not block:
+                eof=True
+                break
+            buffer+=block
+            newlines+=block.count(b'\n')
+            returns+=block.count(b'\r')
+
+    if not eof:
+        #only the complete lines, so no character is split at the end of the buffer
+        del buffer[max(buffer.rfind(b'\n'), buffer.rfind(b'\r'))+1:]
+    text=buffer.decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+
+    lines=text.split('\n')
+    sample=[line + '\n' for line in lines[:-1][:nLines]]
+    if len(sample)<nLines and lines[-1]:
+        #the last line without a line break
+        sample.append(lines[-1])
+    return sample
+
+def parseDatasetSample(sample, sep=';', hasHeader=True, nRows=None):
+    #The DataFrame of the sample text (joined lines of readDatasetSample) of the dataset parsed as readDataset parses the file
+    headerV1=None
+    if hasHeader:
+        headerV1=0
+
+    try:
+        return pd.read_csv(io.StringIO(sample), sep=sep, header=headerV1, nrows=nRows)
+    except Exception:
+        reader = csv.reader(io.StringIO(sample), delimiter=sep)
+        return pd.DataFrame(list(islice(reader, nRows)))
+
+def readDatasetDtypes(filepath, sep=';', encoding='utf-8-sig', hasHeader=True, nRows=None, chunkSize=100000, usecols=None):
+    #The dtypes pandas infers for the columns of the whole dataset, found chunk by chunk (only a chunk is kept in memory),
+    #or None when the chunks keep the dtypes of the whole file anyway (columnar store, arff). pandas infers the dtypes
+    #of every chunk apart, so the chunks read with these dtypes have the values of a full read: int64 while all the
+    #chunks are integer, float64 while they are integer or float (e.g. a chunk with missing values), bool while they
+    #are all boolean, else text
+    if readColumnStoreManifest(filepath, sep=sep, encoding=encoding, hasHeader=hasHeader) is not None or is_arff_file(filepath):
+        return None
+
+    headerV1=None
+    if hasHeader:
+        headerV1=0
+
+    kinds={}
+    try:
+        for chunk in pd.read_csv(filepath, sep=sep, encoding=encoding, header=headerV1, nrows=nRows, chunksize=chunkSize, usecols=usecols):
+            for name, columnDtype in chunk.dtypes.items():
+                kinds.setdefault(name, set()).add(columnDtype.kind if isinstance(columnDtype, np.dtype) else 'O')
+    except Exception:
+        #the csv.reader fallback of readDatasetChunks reads text only
+        return None
+
+    dtypes={}
+    for name, columnKinds in kinds.items():
+        if columnKinds=={'b'}:
+            dtypes[name]='bool'
+        elif columnKinds<={'i', 'u'}:
+            dtypes[name]='int64'
+        elif columnKinds<={'i', 'u', 'f'}:
+            dtypes[name]='float64'
+        else:
+            dtypes[name]=str
+    return dtypes
+
+def readDatasetChunks(filepath, sep=';', encoding='utf-8-sig', hasHeader=True, nRows=None, chunkSize=100000, usecols=None, dtype=None):
+    #Generator of the DataFrames of up to chunkSize rows of the dataset. Only a chunk is kept in memory.
+    #pandas infers the dtypes of every chunk apart, dtype (see readDatasetDtypes) keeps a column alike in all the chunks
+    manifest=readColumnStoreManifest(filepath, sep=sep, encoding=encoding, hasHeader=hasHeader)
+    if manifest is not None:
+        rows=manifest['rows'] if nRows is None else min(nRows, manifest['rows'])
+        for start in range(0, rows, chunkSize):
+            yield readColumnStore(filepath, sep=sep, encoding=encoding, hasHeader=hasHeader, nRows=min(chunkSize, rows-start), usecols=usecols, startRow=start)
+        return
+
+    if is_arff_file(filepath):
+        chunks=readArff(filepath, encoding, nRows=nRows, chunkSize=chunkSize, usecols=usecols)
+        if chunks is not None:
+            yield from chunks
+            return
+        dataset=loadarfftoDataframe(filepath, encoding, nRows=nRows)
+        if isinstance(dataset, pd.DataFrame):
+            for start in range(0, len(dataset), chunkSize):
+                yield dataset.iloc[start:start+chunkSize]
+            return
+
+    headerV1=None
+    if hasHeader:
+        headerV1=0
+
+    rowsRead=0
+    try:
+        for chunk in pd.read_csv(filepath, sep=sep, encoding=encoding, header=headerV1, nrows=nRows, chunksize=chunkSize, usecols=usecols, dtype=dtype):
+            rowsRead+=len(chunk)
+            yield chunk
+        return
+    except Exception:
+        pass
+
+    #pandas failed. Go on with csv.reader after the rows already read
+    with open(filepath, mode='r', encoding=encoding, newline='') as file:
+        reader = csv.reader(file, delimiter=sep)
+        header=None
+        if hasHeader:
+            header=next(reader, None)
+        rows=islice(reader, rowsRead, None if nRows is None else nRows)
+        while True:
+            data=list(islice(rows, chunkSize))
+            if not data:
+                break
+            dataset=pd.DataFrame(data)
+            if header is not None:
+                #ragged rows get positional names for the columns beyond the header
+                dataset.columns=[header[i] if i<len(header) else i for i in range(len(dataset.columns))]
+            yield dataset
+
+#Columnar store of a dataset. A hidden folder next to the dataset with a NumPy file per column
+#(text columns as int32 codes of their distinct values) and a manifest.json. It is read through
+#mmap, so only the selected columns and rows are loaded and no text is tokenized again.
+def columnStorePath(filepath):
+    folder, name=os.path.split(filepath)
+    return os.path.join(folder, '.' + name + '.columns')
+
+def columnStoreKey(filepath, sep, encoding, hasHeader):
+    #The store is valid while the dataset file and the way it is parsed are unchanged
+    stat=os.stat(filepath)
+    return {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'sep': sep, 'encoding': encoding, 'hasHeader': bool(hasHeader)}
+
+def writeColumnStore(filepath, sep=';', encoding='utf-8-sig', hasHeader=True):
+    #Parses the dataset once and writes its columnar store. Returns the manifest or None
+    storePath=columnStorePath(filepath)
+    tempPath=storePath + '.tmp'
+    try:
+        dataset=readDataset(filepath, sep=sep, encoding=encoding, hasHeader=hasHeader)
+        if not isinstance(dataset, pd.DataFrame):
+            return None
+
+        shutil.rmtree(tempPath, ignore_errors=True)
+        os.makedirs(tempPath)
+        columns=[]
+        for j, name in enumerate(dataset.columns):
+            values=dataset.iloc[:, j]
+            column={'name': name, 'dtype': str(values.dtype)}
+            if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biuf':
+                column['kind']='values'
+                np.save(os.path.join(tempPath, str(j) + '.npy'), values.to_numpy())
+            else:
+                #missing values get the code -1
+                codes, uniques=pd.factorize(values)
+                column['kind']='codes'
+                column['values']=list(uniques)
+                np.save(os.path.join(tempPath, str(j) + '.npy'), codes.astype(np.int32))
+            columns.append(column)
+
+        manifest={'key': columnStoreKey(filepath, sep, encoding, hasHeader), 'rows': len(dataset), 'columns': columns}
+        with open(os.path.join(tempPath, 'manifest.json'), 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+
+        shutil.rmtree(storePath, ignore_errors=True)
+        os.replace(tempPath, storePath)
+        return manifest
+
+    except Exception as e:
+        shutil.rmtree(tempPath, ignore_errors=True)
+        print(f"An error occurred: {e}")
+        return None
+
+def readColumnStoreManifest(filepath, sep=';', encoding='utf-8-sig', hasHeader=True):
+    #The manifest of a valid columnar store of the dataset or None
+    try:
+        with open(os.path.join(columnStorePath(filepath), 'manifest.json'), 'r', encoding='utf-8') as file:
+            manifest=json.load(file)
+        if manifest['key']!=columnStoreKey(filepath, sep, encoding, hasHeader):
+            return None
+        return manifest
+    except Exception:
+        return None
+
+def readColumnStore(filepath, sep=';', encoding='utf-8-sig', hasHeader=True, nRows=None, usecols=None, startRow=0):
+    #The DataFrame of nRows rows from startRow of the usecols columns of a valid columnar store of the dataset or None
+    manifest=readColumnStoreManifest(filepath, sep=sep, encoding=encoding, hasHeader=hasHeader)
+    if manifest is None:
+        return None
+
+    endRow=None if nRows is None else startRow+nRows
+    data={}
+    for j, column in enumerate(manifest['columns']):
+        if usecols is not None and column['name'] not in usecols:
+            continue
+        values=np.load(os.path.join(columnStorePath(filepath), str(j) + '.npy'), mmap_mode='r')[startRow:endRow]
+        if column['kind']=='codes':
+            #the code -1 picks the missing value appended last
+            uniques=np.empty(len(column['values'])+1, dtype=object)
+            uniques[:-1]=column['values']
+            uniques[-1]=np.nan
+            series=pd.Series(uniques[values], dtype=object)
+            if column['dtype']!='object':
+                series=series.astype(column['dtype'])
+        else:
+            series=pd.Series(np.array(values))
+        data[column['name']]=series
+
+    dataset=pd.DataFrame(data)
+    dataset.index=pd.RangeIndex(startRow, startRow+len(dataset))
+    return dataset
+
+def countDatasetRecords(filepath, blockSize=1024*1024):
+    #Counts the lines of the dataset as the text mode reading does (\n, \r\n or \r end a line)
+    #on binary blocks, so nothing is decoded and only a block is kept in memory
+    newlines=0
+    returns=0
+    pairs=0
+    last=b''
+    with open(filepath, 'rb') as file:
+        block=file.read(blockSize)
+        if block.startswith(codecs.BOM_UTF8):
+            block=block[len(codecs.BOM_UTF8):] or file.read(blockSize)
+        while block:
+            newlines+=block.count(b'\n')
+            if b'\r' in block:
+                returns+=block.count(b'\r')
+                pairs+=block.count(b'\r\n')
+            #a \r\n split between two blocks
+            if last==b'\r' and block[:1]==b'\n':
+                pairs+=1
+            last=block[-1:]
+            block=file.read(blockSize)
+
+    line_count=newlines+returns-pairs
+    #the last line without a line break
+    if last and last not in (b'\n', b'\r'):
+        line_count+=1
     return line_count
\ No newline at end of file
@@ -4,16 +4,30 @@ import sys
 import os
 import csv
 import json
-from collections import namedtuple
+import heapq
+import tempfile
+from collections import namedtuple, OrderedDict
 from itertools import combinations
 from time import time
 import pandas as pd
 import numpy as np
+from scipy import sparse
 import datasetAttrAutoDetectMetadata as Metadata
 import Global
 # global variables section
 max_rules=1000
 max_items=999
+# transactions count from which itemsetManager counts support with packed bitsets instead of python sets
+bitset_threshold=20000
+# support ratio from which the eclat miner switches from tidsets to diffsets (dEclat)
+diffset_density=0.5
+# maximum count of itemset supports kept in the support cache of itemsetManager
+support_cache_size=200000
+# frequent itemsets whose rule statistics are computed in one vectorized batch
+rule_batch_size=1024
+# dataset file size (bytes) from which the records are streamed in chunks of stream_chunk_rows lines
+stream_min_bytes=256*1024*1024
+stream_chunk_rows=100000
 
 metaDataFile=None
 
@@ -34,22 +48,275 @@ def right(s, amount):
 def mid(s, offset, amount):
     return s[offset:offset+amount]
 
+def chunks(iterable, size):
+    """
+    Returns a generator of lists of (up to) size consecutive elements of iterable.
+    """
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 ################################################################################
 # Data structures.
 ################################################################################
+def popcount(bitmap):
+    """
+    Returns the number of set bits of a python int.
+    """
+    return bitmap.bit_count()
+
+if not hasattr(int, 'bit_count'):
+    # python < 3.10
+    def popcount(bitmap):
+        return bin(bitmap).count('1')
+
+class tidsetCounter(object):
+    """
+    Support counting backend. Intersects the python sets of the transaction
+    indexes of every item.
+    """
+
+    def __init__(self, itemset_index_map, num_itemset):
+        """
+        Initialization
+
+        Arguments:
+            itemset_index_map -- A dict item -> set of transaction indexes.
+            num_itemset -- The count of itemsets (transactions).
+        """
+        self.__itemset_index_map = itemset_index_map
+
+    def calc_count(self, items):
+        """
+        Returns the number of transactions that contain all the items.
+
+        Arguments:
+            items -- Items as a not empty iterable object (['A', 'B', 'C']).
+        """
+        # Create the itemset index intersection.
+        sum_indexes = None
+        for item in items:
+            indexes = self.__itemset_index_map.get(item)
+            if indexes is None:
+                # No support for any set that contains a not existing item.
+                return 0
+            if sum_indexes is None:
+                # Assign the indexes on the first time.
+                sum_indexes = indexes
+            else:
+                # Calculate the intersection on not the first time.
+                sum_indexes = sum_indexes.intersection(indexes)
+        # Calculate and return the support.
+        return len(sum_indexes)
+
+class bitsetCounter(object):
+    """
+    Support counting backend. Keeps the transaction indexes of every item as a
+    packed bit array (python int, bit i is set when transaction i contains the item)
+    and counts the support with AND plus popcount.
+    The bitmaps are built lazily, so only the items that take part in candidates
+    of length>1 (the frequent ones) pay the conversion.
+    """
+
+    def __init__(self, itemset_index_map, num_itemset, bitmaps=None):
+        """
+        Initialization
+
+        Arguments:
+            itemset_index_map -- A dict item -> set of transaction indexes.
+            num_itemset -- The count of itemsets (transactions).
+            bitmaps -- A dict item -> bitmap of the items whose bitmaps are
+                       already known (e.g. the columns of a 3-SI matrix).
+        """
+        self.__itemset_index_map = itemset_index_map
+        self.__num_itemset = num_itemset
+        self.__bitmaps = dict(bitmaps) if bitmaps else {}
+
+    def bitmap(self, item):
+        """
+        Returns the bitmap of an item or None if the item does not exist.
+        """
+        bitmap = self.__bitmaps.get(item)
+        if bitmap is None:
+            indexes = self.__itemset_index_map.get(item)
+            if indexes is None:
+                return None
+            bits = np.zeros(self.__num_itemset, dtype=np.uint8)
+            bits[np.fromiter(indexes, dtype=np.int64, count=len(indexes))] = 1
+            bitmap = int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+            self.__bitmaps[item] = bitmap
+        return bitmap
+
+    def calc_count(self, items):
+        """
+        Returns the number of transactions that contain all the items.
+
+        Arguments:
+            items -- Items as a not empty iterable object (['A', 'B', 'C']).
+        """
+        # One item. Its support is the length of its transaction indexes set.
+        if len(items) == 1:
+            indexes = self.__itemset_index_map.get(next(iter(items)))
+            return 0 if indexes is None else len(indexes)
+        sum_bitmap = None
+        for item in items:
+            bitmap = self.bitmap(item)
+            if bitmap is None:
+                # No support for any set that contains a not existing item.
+                return 0
+            if sum_bitmap is None:
+                sum_bitmap = bitmap
+            else:
+                sum_bitmap &= bitmap
+        return popcount(sum_bitmap)
+
+class supportCache(object):
+    """
+    Bounded memory cache of itemset counts keyed by frozenset. When max_size
+    entries are reached the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size):
+        """
+        Initialization
+
+        Arguments:
+            max_size -- The maximum count of entries (0 disables the cache).
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__counts = OrderedDict()
+
+    def get(self, key):
+        """
+        Returns the cached count of an itemset (frozenset) or None.
+        """
+        count = self.__counts.get(key)
+        if count is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__counts.move_to_end(key)
+        return count
+
+    def put(self, key, count):
+        """
+        Caches the count of an itemset (frozenset).
+        """
+        if self.max_size <= 0:
+            return
+        self.__counts[key] = count
+        self.__counts.move_to_end(key)
+        if len(self.__counts) > self.max_size:
+            self.__counts.popitem(last=False)
+
+    def clear(self):
+        self.__counts.clear()
+
+    def __len__(self):
+        return len(self.__counts)
+
+# Available support counting backends of itemsetManager.
+counting_backends = {
+    'set': tidsetCounter,
+    'bitset': bitsetCounter,
+}
+
+class itemDictionary(object):
+    """
+    Maps the items (e.g. strings) to dense integer ids and back. The ids of the
+    items given on creation follow their sorted order, so sorting the ids sorts
+    the items too. Items encoded later get the next free ids.
+    """
+
+    def __init__(self, items=()):
+        """
+        Initialization
+
+        Arguments:
+            items -- An iterable of the items to encode (duplicates allowed).
+        """
+        self.__ids = {}
+        self.__items = []
+        for item in sorted(set(items)):
+            self.encode(item)
+
+    def encode(self, item):
+        """
+        Returns the id of an item. A new id is created for an unknown item.
+        """
+        item_id = self.__ids.get(item)
+        if item_id is None:
+            item_id = len(self.__items)
+            self.__ids[item] = item_id
+            self.__items.append(item)
+        return item_id
+
+    def encode_itemset(self, itemset):
+        """
+        Returns the ids of the items of an itemset as a list.
+        """
+        return [self.encode(item) for item in itemset]
+
+    def decode(self, item_id):
+        """
+        Returns the item of an id.
+        """
+        return self.__items[item_id]
+
+    def decode_itemset(self, item_ids):
+        """
+        Returns the items of an iterable of ids as a list.
+        """
+        return [self.__items[item_id] for item_id in item_ids]
+
+    def __len__(self):
+        return len(self.__items)
+
 class itemsetManager(object):
+    """
+    Vertical index (item id -> transaction indexes) of the itemsets.
+    The items are encoded to integer ids (see itemDictionary) once, so all the
+    methods below take and return item ids. Decode them with dictionary.
+    """
 
-    def __init__(self, itemsets):
+    def __init__(self, itemsets, backend=None, cache_size=None):
         """
         Initialization
 
         Arguments:
             itemsets -- A itemset iterable object
                             (example [['A', 'B', 'C'], ['B', 'C']]).
+            backend -- The support counting backend name (see counting_backends).
+                       None selects 'bitset' when the itemsets count reaches
+                       bitset_threshold, else 'set'.
+            cache_size -- The maximum entries of the support cache
+                          (None for support_cache_size).
         """
         self.__num_itemset = 0
         self.__items = []
         self.__itemset_index_map = {}
+        self.__backend = backend
+        self.__counter = None
+        self.__cache = supportCache(support_cache_size if cache_size is None else cache_size)
+        # Bitmaps of the items while all the itemsets come from boolean matrices (see add_matrix).
+        self.__bitmaps = {}
+        # Column of the items while all the itemsets come from categorical columns (see add_columns).
+        self.__item_groups = {}
+
+        # The ids follow the sorted order of the items.
+        if not isinstance(itemsets, (list, tuple)):
+            itemsets = list(itemsets)
+        self.__dictionary = itemDictionary(item for itemset in itemsets for item in itemset)
+
+        if backend is not None and backend not in counting_backends:
+            raise ValueError('Unknown support counting backend ' + str(backend) + '!!!')
 
         for itemset in itemsets:
             self.add_itemset(itemset)
@@ -61,18 +328,141 @@ class itemsetManager(object):
         Arguments:
             itemset -- A itemset as an iterable object (['A', 'B', 'C']).
         """
-        for item in itemset:
-            if item not in self.__itemset_index_map:
+        self.add_itemsets([itemset])
+
+    def add_itemsets(self, itemsets):
+        """
+        Add many itemsets (e.g. a chunk of a dataset). Their new items get the next
+        free ids, call sort_items when all the itemsets are added.
+
+        Arguments:
+            itemsets -- A itemset iterable object.
+        """
+        index_map = self.__itemset_index_map
+        num_itemset = self.__num_itemset
+        for itemset in itemsets:
+            for item in self.__dictionary.encode_itemset(itemset):
+                if item not in index_map:
+                    self.__items.append(item)
+                    index_map[item] = set()
+                index_map[item].add(self.__num_itemset)
+            self.__num_itemset += 1
+        # The bitmaps of the matrices miss these itemsets and their items may share a column.
+        if self.__num_itemset > num_itemset:
+            self.__bitmaps = None
+            self.__item_groups = None
+        self.__counter = None
+        self.__cache.clear()
+
+    def add_matrix(self, matrix, items):
+        """
+        Add the rows of a boolean matrix as itemsets. Cell [i, j] is True when
+        the row i contains items[j]. The columns become the transaction indexes
+        (and bitmaps) of their items without any itemset of strings.
+
+        Arguments:
+            matrix -- A boolean NumPy array or a scipy.sparse matrix.
+            items -- The item of every column of the matrix.
+        """
+        if sparse.issparse(matrix):
+            matrix = sparse.csc_matrix(matrix, dtype=bool)
+            matrix.eliminate_zeros()
+            matrix.sort_indices()
+            columns = (matrix.indices[matrix.indptr[j]:matrix.indptr[j + 1]] for j in range(matrix.shape[1]))
+        else:
+            matrix = np.asarray(matrix, dtype=bool)
+            columns = (np.flatnonzero(matrix[:, j]) for j in range(matrix.shape[1]))
+
+        index_map = self.__itemset_index_map
+        offset = self.__num_itemset
+        num_rows = matrix.shape[0]
+        for item, indexes in zip(self.__dictionary.encode_itemset(items), columns):
+            if not len(indexes):
+                continue
+            new_item = item not in index_map
+            if new_item:
                 self.__items.append(item)
-                self.__itemset_index_map[item] = set()
-            self.__itemset_index_map[item].add(self.__num_itemset)
-        self.__num_itemset += 1
+                index_map[item] = set()
+            index_map[item].update((indexes + offset).tolist())
+            # A bitmap costs num_rows/8 bytes. Keep it for the items it is smaller
+            # than their indexes (a bitmap has to hold all the rows of its item).
+            if self.__bitmaps is not None and (item in self.__bitmaps or (new_item and len(indexes) * 64 >= num_rows)):
+                bits = np.zeros(num_rows, dtype=np.uint8)
+                bits[indexes] = 1
+                bitmap = int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little') << offset
+                self.__bitmaps[item] = self.__bitmaps.get(item, 0) | bitmap
+        self.__num_itemset += num_rows
+        # Items of one matrix row may share a column.
+        self.__item_groups = None
+        self.__counter = None
+        self.__cache.clear()
+
+    def add_columns(self, codes, items, item_columns):
+        """
+        Add the rows of categorical columns (one item per column, like 4-NOA
+        datasets) as itemsets. The items of a column never share an itemset, so
+        their candidates are skipped (see item_groups).
+
+        Arguments:
+            codes -- A (rows, columns) integer NumPy array. codes[i, j] is the
+                     index in items of the item of the row i in the column j.
+            items -- The items of all the columns.
+            item_columns -- The column of every item.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        # The groups hold while all the itemsets come from categorical columns.
+        item_groups = self.__item_groups if self.__item_groups or not self.__num_itemset else None
+        num_rows, num_columns = codes.shape
+        rows = np.repeat(np.arange(num_rows), num_columns)
+        matrix = sparse.csc_matrix((np.ones(codes.size, dtype=bool), (rows, codes.ravel())), shape=(num_rows, len(items)))
+        self.add_matrix(matrix, items)
+        if item_groups is not None:
+            for item, column in zip(self.__dictionary.encode_itemset(items), item_columns):
+                if item_groups.setdefault(item, column) != column:
+                    # The same item in two columns.
+                    item_groups = None
+                    break
+        self.__item_groups = item_groups
+
+    def add_codes(self, transactions, uniques):
+        """
+        Add itemsets of integer item codes (e.g. the 2-INV transactions of
+        group_transaction_codes). The codes become the transaction indexes of
+        their items, so only the distinct items are encoded to ids.
+
+        Arguments:
+            transactions -- A list of integer NumPy arrays of distinct codes, one per itemset.
+            uniques -- The item of every code.
+        """
+        codes = np.concatenate(transactions).astype(np.int64) if transactions else np.empty(0, dtype=np.int64)
+        rows = np.repeat(np.arange(len(transactions)), [len(transaction) for transaction in transactions])
+        # Only the items of the itemsets get ids (uniques may hold the items of dropped groups).
+        used, codes = np.unique(codes, return_inverse=True)
+        matrix = sparse.csc_matrix((np.ones(codes.size, dtype=bool), (rows, codes)), shape=(len(transactions), len(used)))
+        self.add_matrix(matrix, [uniques[code] for code in used.tolist()])
+
+    def sort_items(self):
+        """
+        Renumbers the item ids in the sorted order of the items, as if all the
+        itemsets were given on creation.
+        """
+        old_dictionary = self.__dictionary
+        self.__dictionary = itemDictionary(old_dictionary.decode(item_id) for item_id in range(len(old_dictionary)))
+        new_ids = [self.__dictionary.encode(old_dictionary.decode(item_id)) for item_id in range(len(old_dictionary))]
+        self.__itemset_index_map = {new_ids[item]: tidset for item, tidset in self.__itemset_index_map.items()}
+        self.__items = [new_ids[item] for item in self.__items]
+        if self.__bitmaps:
+            self.__bitmaps = {new_ids[item]: bitmap for item, bitmap in self.__bitmaps.items()}
+        if self.__item_groups:
+            self.__item_groups = {new_ids[item]: group for item, group in self.__item_groups.items()}
+        self.__counter = None
+        self.__cache.clear()
 
     def calc_count(self, items):
         """
         Returns the number of items.
         Arguments:
-            items -- Items as an iterable object (['A', 'B', 'C']).
+            items -- Item ids as an iterable object ([0, 1, 2]).
         """
         # Empty items is supported by all itemsets.
         if not items:
@@ -80,28 +470,70 @@ class itemsetManager(object):
         # Empty itemsets supports no items.
         if not self.num_itemset:
             return 0
-        # Create the itemset index intersection.
-        sum_indexes = None
-        for item in items:
-            indexes = self.__itemset_index_map.get(item)
-            if indexes is None:
-                # No support for any set that contains a not existing item.
-                return 0
-            if sum_indexes is None:
-                # Assign the indexes on the first time.
-                sum_indexes = indexes
-            else:
-                # Calculate the intersection on not the first time.
-                sum_indexes = sum_indexes.intersection(indexes)
-        # Calculate and return the support.
-        return len(sum_indexes)  
-    
+        # Counted before (by the miner or a previous rule).
+        key = items if isinstance(items, frozenset) else frozenset(items)
+        count = self.__cache.get(key)
+        if count is None:
+            count = self.counter.calc_count(key)
+            self.__cache.put(key, count)
+        return count
+
+    def cache_count(self, items, count):
+        """
+        Stores a count computed outside calc_count (e.g. by FP-growth or Eclat)
+        in the support cache.
+        """
+        self.__cache.put(frozenset(items), count)
+
     def initial_candidates(self):
         """
         Returns the initial candidates.
         """
         return [frozenset([item]) for item in self.items]
 
+    def tidset(self, item):
+        """
+        Returns the set of the transaction indexes that contain the item.
+        """
+        return self.__itemset_index_map.get(item, set())
+
+    @property
+    def counter(self):
+        """
+        Returns the support counting backend. It is created on first use.
+        """
+        if self.__counter is None:
+            backend = self.__backend
+            if backend is None:
+                backend = 'bitset' if self.__num_itemset >= bitset_threshold else 'set'
+            if backend == 'bitset' and self.__bitmaps:
+                self.__counter = bitsetCounter(self.__itemset_index_map, self.__num_itemset, self.__bitmaps)
+            else:
+                self.__counter = counting_backends[backend](self.__itemset_index_map, self.__num_itemset)
+        return self.__counter
+
+    @property
+    def item_groups(self):
+        """
+        Returns a dict item id -> group when the items of a group never share
+        an itemset (e.g. the values of a 4-NOA column), else None.
+        """
+        return self.__item_groups or None
+
+    @property
+    def dictionary(self):
+        """
+        Returns the itemDictionary of the item ids.
+        """
+        return self.__dictionary
+
+    @property
+    def cache(self):
+        """
+        Returns the support cache (a supportCache instance).
+        """
+        return self.__cache
+
     @property
     def num_itemset(self):
         """
@@ -112,59 +544,166 @@ class itemsetManager(object):
     @property
     def items(self):
         """
-        Returns the items list that the itemset is consisted of.
+        Returns the item ids list that the itemset is consisted of.
         """
         return sorted(self.__items)
 
+    def __len__(self):
+        return self.__num_itemset
+
+    def to_arrays(self):
+        """
+        Returns the index as a dict of NumPy arrays (see from_arrays):
+        the items of the ids as JSON, the transaction indexes of every item id
+        (tids split at indptr) and the group of every item id (-1 for none).
+        """
+        item_ids = sorted(self.__itemset_index_map)
+        tidsets = [sorted(self.__itemset_index_map[item]) for item in item_ids]
+        item_groups = self.__item_groups or {}
+        return {
+            'vocabulary': np.array(json.dumps(self.__dictionary.decode_itemset(range(len(self.__dictionary))))),
+            'num_itemset': np.array(self.__num_itemset, dtype=np.int64),
+            'item_ids': np.array(item_ids, dtype=np.int64),
+            'indptr': np.cumsum([0] + [len(tidset) for tidset in tidsets], dtype=np.int64),
+            'tids': np.fromiter((tid for tidset in tidsets for tid in tidset), dtype=np.int64),
+            'item_groups': np.array([item_groups.get(item_id, -1) for item_id in range(len(self.__dictionary))], dtype=np.int64),
+        }
+
+    @staticmethod
+    def from_arrays(arrays, backend=None, cache_size=None):
+        """
+        Create the itemsetManager of the arrays of to_arrays (e.g. loaded from a npz file).
+        """
+        manager = itemsetManager([], backend, cache_size)
+        manager.__dictionary = itemDictionary(json.loads(str(arrays['vocabulary'])))
+        manager.__num_itemset = int(arrays['num_itemset'])
+        indptr = arrays['indptr'].tolist()
+        tids = arrays['tids']
+        item_ids = arrays['item_ids'].tolist()
+        manager.__items = list(item_ids)
+        manager.__itemset_index_map = {item: set(tids[indptr[i]:indptr[i + 1]].tolist()) for i, item in enumerate(item_ids)}
+        manager.__bitmaps = None
+        manager.__item_groups = {item_id: group for item_id, group in enumerate(arrays['item_groups'].tolist()) if group >= 0} or None
+        return manager
+
     @staticmethod
-    def create(itemsets):
+    def create(itemsets, backend=None, cache_size=None):
         """
         Create the itemsetManager with an itemset instance.
         If the given instance is a itemsetManager then it returns itself.
         """
         if isinstance(itemsets, itemsetManager):
             return itemsets
-        return itemsetManager(itemsets)
+        return itemsetManager(itemsets, backend, cache_size)
 
 FrequentItemset = namedtuple('FrequentItemset', ('items', 'support', 'count'))
 # Association_rule = namedtuple('Association_rule', FrequentItemset._fields + ('rule_statistics',))
 ruleStatistic = namedtuple('ruleStatistic', ('itemset', 'support', 'count', 'LHS', 'RHS', 'confidence', 'lift', 'conviction', 'leverage', 'LHS_count', 'LHS_support', 'RHS_count', 'RHS_support'))
 
+# ruleStatistic fields of the output rules columns, the sort index (ssort) refers to them.
+rule_sort_fields = ('LHS', 'RHS', 'confidence', 'lift', 'conviction', 'leverage', 'LHS_count', 'LHS_support', 'RHS_count', 'RHS_support', 'support', 'count')
+
+class topRules(object):
+    """
+    Bounded heap of the best k rules (ruleStatistic instances) on a field.
+    On equal values the rule pushed first is the better one.
+    """
+
+    def __init__(self, k, field, descending=True):
+        """
+        Initialization
+
+        Arguments:
+            k -- The count of rules kept.
+            field -- The ruleStatistic field the rules are ranked by.
+            descending -- True keeps the rules with the largest values.
+        """
+        self.k = k
+        self.field = field
+        self.descending = descending
+        self.__index = ruleStatistic._fields.index(field)
+        self.__sign = 1 if descending else -1
+        self.__pushed = 0
+        self.__heap = []
+
+    def push(self, rule):
+        """
+        Keeps a rule if it is one of the best k rules so far.
+        """
+        key = (self.__sign * rule[self.__index], -self.__pushed)
+        self.__pushed += 1
+        if len(self.__heap) < self.k:
+            heapq.heappush(self.__heap, (key, rule))
+        elif key > self.__heap[0][0]:
+            heapq.heapreplace(self.__heap, (key, rule))
+
+    @property
+    def threshold(self):
+        """
+        The value of the worst kept rule once k rules are kept, else None.
+        """
+        if len(self.__heap) < self.k:
+            return None
+        return self.__sign * self.__heap[0][0][0]
+
+    def rules(self):
+        """
+        Returns the kept rules as a list, best first.
+        """
+        return [rule for key, rule in sorted(self.__heap, reverse=True)]
+
+    def __len__(self):
+        return len(self.__heap)
+
 ################################################################################
 # Inner core functions.
 ################################################################################
-def extract_next_candidates(prev_candidates, length):
+def same_group(item_groups, item, other_item):
+    """
+    Returns True if two items belong to the same group of item_groups.
+    """
+    group = item_groups.get(item)
+    return group is not None and group == item_groups.get(other_item)
+
+def extract_next_candidates(prev_candidates, length, item_groups=None):
     """
     Returns the association rules candidates as a list.
+    Two (length-1)-itemsets sharing their first length-2 (sorted) items are joined
+    and the candidates having a (length-1)-subset that is not in the previous
+    candidates are pruned.
 
     Arguments:
         prev_candidates -- Previous candidates as a list.
         length -- The lengths of the next candidates.
+        item_groups -- A dict item -> group of the items that never share an
+                       itemset with another item of their group (or None).
     """
 
-    # Solve the items.
-    item_set = set()
-    for candidate in prev_candidates:
-        for item in candidate:
-            item_set.add(item)
-    items = sorted(item_set)
-
-    # Create the temporary candidates. These will be filtered below.
-    tmp_next_candidates = (frozenset(x) for x in combinations(items, length))
-
-    # Return all the candidates if the length of the next candidates is 2
-    # because their subsets are the same as items.
-    if length < 3:
-        return list(tmp_next_candidates)
-
-    # Filter candidates that all of their subsets are
-    # in the previous candidates.
-    next_candidates = [
-        candidate for candidate in tmp_next_candidates
-        if all(
-            True if frozenset(x) in prev_candidates else False
-            for x in combinations(candidate, length - 1))
-    ]
+    # Sorted tuples of the previous candidates. Their hash set is the index of the subset pruning.
+    prev_tuples = sorted(tuple(sorted(candidate)) for candidate in prev_candidates)
+    prev_index = set(prev_tuples)
+
+    next_candidates = []
+    start = 0
+    while start < len(prev_tuples):
+        # The block of the previous candidates sharing the same prefix.
+        prefix = prev_tuples[start][:-1]
+        end = start + 1
+        while end < len(prev_tuples) and prev_tuples[end][:-1] == prefix:
+            end += 1
+
+        for i in range(start, end):
+            for j in range(i + 1, end):
+                # The joined items of the same group have no support. The prefix items were checked before.
+                if item_groups and same_group(item_groups, prev_tuples[i][-1], prev_tuples[j][-1]):
+                    continue
+                candidate = prev_tuples[i] + (prev_tuples[j][-1],)
+                # The subsets without one of the last two items are the joined ones.
+                # Check the rest (none if the length of the next candidates is 2).
+                if all(candidate[:k] + candidate[k+1:] in prev_index for k in range(length - 2)):
+                    next_candidates.append(frozenset(candidate))
+        start = end
+
     return next_candidates
 
 def generate_frequent_itemsets(itemset_manager, min_support, **kwargs):
@@ -177,9 +716,12 @@ def generate_frequent_itemsets(itemset_manager, min_support, **kwargs):
 
     Keyword arguments:
         max_length -- The maximum length of association_rules (integer).
+        support_floor -- A function returning a raised minimum support (float)
+                         the next candidates are checked against too.
     """
     # Parse arguments.
     max_length = kwargs.get('max_length')
+    support_floor = kwargs.get('support_floor')
     
     # Process.
     candidates = itemset_manager.initial_candidates()
@@ -191,6 +733,8 @@ def generate_frequent_itemsets(itemset_manager, min_support, **kwargs):
             support = float(count/itemset_manager.num_itemset)
             if support < min_support:
                 continue
+            if support_floor and support < support_floor():
+                continue
                 
             candidate_set = frozenset(association_rule_candidate)
             association_rules.add(candidate_set)
@@ -199,57 +743,373 @@ def generate_frequent_itemsets(itemset_manager, min_support, **kwargs):
         length += 1
         if max_length and length > max_length:
             break
-        candidates = extract_next_candidates(association_rules, length)
+        candidates = extract_next_candidates(association_rules, length, itemset_manager.item_groups)
+
+class fpNode(object):
+    """
+    A node of the FP-tree.
+    """
+    __slots__ = ('item', 'count', 'parent', 'children')
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = {}
+
+class fpTree(object):
+    """
+    Frequent pattern tree. The transactions are inserted as paths from the root
+    with their items ordered by descending frequency, so common prefixes share nodes.
+    """
+
+    def __init__(self):
+        self.root = fpNode(None, None)
+        # item -> list of the nodes of the item (the header table)
+        self.nodes = {}
+        # item -> total count of the item in the tree
+        self.counts = {}
+
+    def add(self, transaction, count=1):
+        """
+        Add a transaction (ordered list of items) as a path of the tree.
+        """
+        node = self.root
+        for item in transaction:
+            child = node.children.get(item)
+            if child is None:
+                child = fpNode(item, node)
+                node.children[item] = child
+                self.nodes.setdefault(item, []).append(child)
+            child.count += count
+            self.counts[item] = self.counts.get(item, 0) + count
+            node = child
+
+    def prefix_paths(self, item):
+        """
+        Returns the conditional pattern base of an item as a list of (path, count).
+        """
+        paths = []
+        for node in self.nodes[item]:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                path.reverse()
+                paths.append((path, node.count))
+        return paths
+
+def mine_fp_tree(tree, suffix, is_frequent, max_length, rank, found):
+    """
+    Appends to found the (itemset, count) of all the frequent itemsets of the
+    tree extended by suffix.
+
+    Arguments:
+        tree -- A fpTree instance.
+        suffix -- The items the tree is conditioned on (tuple).
+        is_frequent -- A function count -> bool.
+        max_length -- The maximum length of the itemsets (integer or None).
+        rank -- A dict item -> order position of the item in the transactions.
+    """
+    # Start from the least frequent items (bottom of the tree).
+    for item in sorted(tree.counts, key=rank.get, reverse=True):
+        itemset = suffix + (item,)
+        found.append((itemset, tree.counts[item]))
+        if max_length and len(itemset) >= max_length:
+            continue
+
+        paths = tree.prefix_paths(item)
+        counts = {}
+        for path, count in paths:
+            for path_item in path:
+                counts[path_item] = counts.get(path_item, 0) + count
+        frequent_items = set(x for x, count in counts.items() if is_frequent(count))
+        if not frequent_items:
+            continue
+
+        # Build the conditional FP-tree of the itemset.
+        conditional_tree = fpTree()
+        for path, count in paths:
+            conditional_tree.add([x for x in path if x in frequent_items], count)
+        mine_fp_tree(conditional_tree, itemset, is_frequent, max_length, rank, found)
+
+def generate_frequent_itemsets_fpgrowth(itemset_manager, min_support, **kwargs):
+    """
+    Returns a generator of support records with given itemsets using FP-growth
+    (no candidate generation). It is a drop-in alternative to
+    generate_frequent_itemsets, the itemsets are yielded ordered by length.
+
+    Arguments:
+        itemset_manager -- itemsets as a itemsetManager instance.
+        min_support -- A minimum support (float).
 
-def gen_rule_statistics(itemset_manager, itemset, **kwargs):
+    Keyword arguments:
+        max_length -- The maximum length of association_rules (integer).
+    """
+    # Parse arguments.
+    max_length = kwargs.get('max_length')
+
+    num_itemset = itemset_manager.num_itemset
+    if not num_itemset:
+        return
+
+    def is_frequent(count):
+        return float(count/num_itemset) >= min_support
+
+    # Frequent items ordered by descending frequency.
+    item_counts = dict((item, len(itemset_manager.tidset(item))) for item in itemset_manager.items)
+    frequent_items = [item for item in itemset_manager.items if is_frequent(item_counts[item])]
+    frequent_items.sort(key=lambda x: item_counts[x], reverse=True)
+    rank = dict((item, i) for i, item in enumerate(frequent_items))
+
+    # Rebuild the (frequent part of the) transactions from the vertical index.
+    transactions = {}
+    for item in frequent_items:
+        for tid in itemset_manager.tidset(item):
+            transactions.setdefault(tid, []).append(item)
+
+    tree = fpTree()
+    for transaction in transactions.values():
+        transaction.sort(key=rank.get)
+        tree.add(transaction)
+    transactions = None
+
+    found = []
+    mine_fp_tree(tree, (), is_frequent, max_length, rank, found)
+
+    found.sort(key=lambda x: len(x[0]))
+    for itemset, count in found:
+        itemset = frozenset(itemset)
+        # Rule generation reads the counts of the subsets from the cache.
+        itemset_manager.cache_count(itemset, count)
+        yield FrequentItemset(itemset, float(count/num_itemset), count)
+
+def mine_eclat_class(prefix, members, is_frequent, max_length, dense_count, use_diffsets, found, item_groups=None):
+    """
+    Appends to found the (itemset, count) of all the frequent itemsets of an
+    equivalence class (itemsets sharing the same prefix), depth first.
+
+    Arguments:
+        prefix -- The common prefix of the class (tuple).
+        members -- A list of (item, tids, count). tids is the tidset of prefix+item
+                   or, in diffsets mode, the diffset of prefix+item from prefix.
+        is_frequent -- A function count -> bool.
+        max_length -- The maximum length of the itemsets (integer or None).
+        dense_count -- The count from which the children switch to diffsets.
+        use_diffsets -- True if the members hold diffsets.
+        item_groups -- A dict item -> group of the items that never share an
+                       itemset with another item of their group (or None).
+    """
+    for i, (item, tids, count) in enumerate(members):
+        itemset = prefix + (item,)
+        found.append((itemset, count))
+        if max_length and len(itemset) >= max_length:
+            continue
+
+        # Dense itemset. Its children differ in a few transactions only.
+        child_diffsets = use_diffsets or count >= dense_count
+        children = []
+        for other_item, other_tids, other_count in members[i+1:]:
+            if item_groups and same_group(item_groups, item, other_item):
+                continue
+            if use_diffsets:
+                # d(PXY) = d(PY) - d(PX)
+                child_tids = other_tids - tids
+                child_count = count - len(child_tids)
+            elif child_diffsets:
+                # d(PXY) = t(PX) - t(PY)
+                child_tids = tids - other_tids
+                child_count = count - len(child_tids)
+            else:
+                # t(PXY) = t(PX) & t(PY)
+                child_tids = tids & other_tids
+                child_count = len(child_tids)
+            if is_frequent(child_count):
+                children.append((other_item, child_tids, child_count))
+        if children:
+            mine_eclat_class(itemset, children, is_frequent, max_length, dense_count, child_diffsets, found, item_groups)
+
+def generate_frequent_itemsets_eclat(itemset_manager, min_support, **kwargs):
     """
-    Returns a generator of rule statistics as ruleStatistic instances.
+    Returns a generator of support records with given itemsets using Eclat
+    (depth first search over the vertical tidsets index of itemset_manager).
+    Dense itemsets switch to diffsets (dEclat) to cut the memory footprint.
+    It is a drop-in alternative to generate_frequent_itemsets, the itemsets are
+    yielded ordered by length.
 
     Arguments:
         itemset_manager -- itemsets as a itemsetManager instance.
-        itemset -- An itemset as a Supportitemset instance.
+        min_support -- A minimum support (float).
+
+    Keyword arguments:
+        max_length -- The maximum length of association_rules (integer).
+    """
+    # Parse arguments.
+    max_length = kwargs.get('max_length')
+
+    num_itemset = itemset_manager.num_itemset
+    if not num_itemset:
+        return
+
+    def is_frequent(count):
+        return float(count/num_itemset) >= min_support
+
+    # Frequent items ordered by ascending frequency keep the tidsets of the classes small.
+    members = []
+    for item in itemset_manager.items:
+        tids = itemset_manager.tidset(item)
+        if is_frequent(len(tids)):
+            members.append((item, tids, len(tids)))
+    members.sort(key=lambda x: x[2])
+
+    found = []
+    mine_eclat_class((), members, is_frequent, max_length, diffset_density*num_itemset, False, found, itemset_manager.item_groups)
+
+    found.sort(key=lambda x: len(x[0]))
+    for itemset, count in found:
+        itemset = frozenset(itemset)
+        # Rule generation reads the counts of the subsets from the cache.
+        itemset_manager.cache_count(itemset, count)
+        yield FrequentItemset(itemset, float(count/num_itemset), count)
+
+# Available frequent itemsets generators of webApriori.
+mining_algorithms = {
+    'apriori': generate_frequent_itemsets,
+    'fpgrowth': generate_frequent_itemsets_fpgrowth,
+    'eclat': generate_frequent_itemsets_eclat,
+}
+
+itemset_subsets_cache = {}
+
+def itemset_subsets(length):
+    """
+    Returns a tuple (positions, ranks) for an itemset of the given length.
+    Subsets are bit masks over its sorted items (bit i set -> item i in the subset).
+    positions[mask] is the tuple of the item positions of a subset and ranks[mask]
+    the rank of the rule with this subset as LHS (by LHS length, then LHS positions).
     """
- 
+    cached = itemset_subsets_cache.get(length)
+    if cached is None:
+        positions = [tuple(i for i in range(length) if mask >> i & 1) for mask in range(1 << length)]
+        ranks = [0] * (1 << length)
+        rank = 0
+        for base_length in range(length + 1):
+            for combination_set in combinations(range(length), base_length):
+                ranks[sum(1 << i for i in combination_set)] = rank
+                rank += 1
+        cached = (positions, ranks)
+        itemset_subsets_cache[length] = cached
+    return cached
+
+def gen_rule_statistics_batch(itemset_manager, itemsets, **kwargs):
+    """
+    Returns the rule statistics of many itemsets as a list with one list of
+    ruleStatistic instances per itemset, ordered by LHS length, then LHS positions.
+    The consequents (RHS) are grown level-wise like ap-genrules: the confidence
+    of a rule can only drop when items move from its LHS to its RHS, so only the
+    consequents of the rules passing min_confidence are joined to the next level.
+    The metrics of a level are computed for the whole batch in one vectorized pass
+    and only the rules passing min_confidence and min_lift are materialized.
+
+    Arguments:
+        itemset_manager -- itemsets as a itemsetManager instance.
+        itemsets -- A list of Supportitemset instances.
+    """
+
     min_confidence = kwargs.get('min_confidence', 0.0)
     min_lift = kwargs.get('min_lift', 0.0)
 
-    items = itemset.items
-    sorted_items = sorted(items)
-    for base_length in range(len(items)):
-        for combination_set in combinations(sorted_items, base_length):
-            LHS = frozenset(combination_set)
-            RHS = frozenset(items.difference(LHS))
-            LHS_count = itemset_manager.calc_count(LHS)
-            RHS_count = itemset_manager.calc_count(RHS)
-            LHS_support = float(LHS_count / itemset_manager.num_itemset)
-            RHS_support = float(RHS_count / itemset_manager.num_itemset)                   
-            confidence = (itemset.support / LHS_support)
-            lift = confidence / RHS_support
-            leverage = itemset.support - (LHS_support * RHS_support)
-            if confidence!=1:
-                conviction = (1 - RHS_support) / (1 - confidence)
-            else:
-                conviction = 999.999
- 
-            if confidence < min_confidence:
-                continue
-            if lift < min_lift:
+    num_itemset = itemset_manager.num_itemset
+    calc_count = itemset_manager.calc_count
+    sorted_itemsets = [sorted(itemset.items) for itemset in itemsets]
+    subsets = [itemset_subsets(len(sorted_items)) for sorted_items in sorted_itemsets]
+    rule_statistics = [[] for x in itemsets]
+
+    # The 1-item consequents of all the itemsets as (itemset index, RHS mask).
+    consequents = [(index, 1 << i) for index, sorted_items in enumerate(sorted_itemsets)
+                                       for i in range(len(sorted_items))]
+    while consequents:
+        # Collect the LHS/RHS and their counts of the splits of the level.
+        LHSs = []
+        RHSs = []
+        supports = []
+        for index, mask in consequents:
+            sorted_items = sorted_itemsets[index]
+            positions = subsets[index][0]
+            LHSs.append(frozenset(map(sorted_items.__getitem__, positions[-1 - mask])))
+            RHSs.append(frozenset(map(sorted_items.__getitem__, positions[mask])))
+            supports.append(itemsets[index].support)
+        LHS_counts = list(map(calc_count, LHSs))
+        RHS_counts = list(map(calc_count, RHSs))
+
+        # Compute the metrics of the level at once.
+        support = np.array(supports, dtype=np.float64)
+        LHS_support = np.array(LHS_counts, dtype=np.int64) / num_itemset
+        RHS_support = np.array(RHS_counts, dtype=np.int64) / num_itemset
+        confidence = support / LHS_support
+        lift = confidence / RHS_support
+        leverage = support - (LHS_support * RHS_support)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            conviction = np.where(confidence != 1, (1 - RHS_support) / (1 - confidence), 999.999)
+        confident = confidence >= min_confidence
+
+        # Materialize the rules passing min_confidence and min_lift.
+        survivors = np.flatnonzero(confident & (lift >= min_lift))
+        for i, rule_confidence, rule_lift, rule_conviction, rule_leverage, rule_LHS_support, rule_RHS_support in zip(
+                survivors.tolist(), confidence[survivors].tolist(), lift[survivors].tolist(),
+                conviction[survivors].tolist(), leverage[survivors].tolist(), LHS_support[survivors].tolist(),
+                RHS_support[survivors].tolist()):
+            index, mask = consequents[i]
+            itemset = itemsets[index]
+            rule_statistics[index].append((subsets[index][1][-1 - mask], ruleStatistic(sorted_itemsets[index], itemset.support, itemset.count,
+                                           LHSs[i], RHSs[i],
+                                           rule_confidence, rule_lift, rule_conviction, rule_leverage,
+                                           LHS_counts[i], rule_LHS_support, RHS_counts[i], rule_RHS_support
+                                           )))
+
+        # Join the consequents of the confident rules of every itemset to the next level.
+        confident_consequents = {}
+        for i in np.flatnonzero(confident).tolist():
+            index, mask = consequents[i]
+            confident_consequents.setdefault(index, set()).add(mask)
+        consequents = []
+        for index, masks in confident_consequents.items():
+            # Joining needs two consequents.
+            if len(masks) < 2:
                 continue
+            positions = subsets[index][0]
+            length = len(positions[-1])
+            for mask in masks:
+                # A candidate is generated once, from its subset without its highest item,
+                # and kept if all its other subsets are confident consequents too.
+                for i in range(mask.bit_length(), length):
+                    candidate = mask | 1 << i
+                    if all(candidate ^ 1 << j in masks for j in positions[mask]):
+                        consequents.append((index, candidate))
+
+    # Restore the order of the rules (LHS length, then LHS positions).
+    for index, ranked_rules in enumerate(rule_statistics):
+        ranked_rules.sort(key=lambda ranked_rule: ranked_rule[0])
+        rule_statistics[index] = [rule for rank, rule in ranked_rules]
+    return rule_statistics
 
-            yield ruleStatistic(sorted_items, itemset.support, itemset.count,
-                                    frozenset(LHS), 
-                                    frozenset(RHS), 
-                                    confidence, lift, conviction, leverage, 
-                                    LHS_count, LHS_support, RHS_count, RHS_support
-                                )
-        
-#####################################        
-#Special purpose functions        
-#####################################
 def transform_association_rules(A_R,RedundantType=0):
     rules=[]
 
-    for item in [x[y] for x in A_R for y in range(0, len(x))]:
+    # All the rules of A_R and the redundancy indexes built once:
+    # (LHS, RHS) --> confidence and RHS --> set of LHS
+    all_rules = [x[y] for x in A_R for y in range(0, len(x))]
+    rule_confidences = {}
+    RHS_LHSs = {}
+    for item in all_rules:
+        key = (item[3], item[4])
+        if key not in rule_confidences or rule_confidences[key] < item[5]:
+            rule_confidences[key] = item[5]
+        RHS_LHSs.setdefault(item[4], set()).add(item[3])
+
+    for item in all_rules:
     # We don't have the initial list sorted because matchRule happens in A_R not in the created list (rules.append(rule))
     #  the next line is kept only for learning purposes
     # for item in sorted([x[y] for x in A_R for y in range(0, len(x))],key=lambda l: len(l[3]),reverse=True):
@@ -257,8 +1117,8 @@ def transform_association_rules(A_R,RedundantType=0):
         # Interchange the antecedent and consequence case. The rule with smaller confidence is removed (support and lift are equal in this case)
         # Case 00000001
         if RedundantType & 1 == 1:
-            matchRule = [x[y] for x in A_R for y in range(0, len(x)) if x[y][3]==item[4] and x[y][4]==item[3] and x[y][5]>=item[5]]
-            if len(matchRule)>0:
+            matchConfidence = rule_confidences.get((item[4], item[3]))
+            if matchConfidence is not None and matchConfidence>=item[5]:
                 # Redundant do not add it to interesting association rules
                 continue
 
@@ -267,16 +1127,9 @@ def transform_association_rules(A_R,RedundantType=0):
         if RedundantType & 2 == 2:
             # If LHS length > 1
             if len(item[3])>1:
-                # Find all the LHS length-1 sub itemsets 
-                ssets = (set(x) for x in combinations(item[3], len(item[3])-1) )
-                i=0
-                # Count how many are the LHS length-1 sub itemsets participating to the A_R
-                for c in ssets:
-                    matchRule = [x[y] for x in A_R for y in range(0, len(x)) if x[y][3]==c and x[y][4]==item[4]]
-                    if len(matchRule)>0:
-                        i+=1
-                # If LHS length-1 sub itemsets count is equal to LHS length then rule is redundant
-                if i==len(item[3]):
+                # If all the LHS length-1 sub itemsets participate to the A_R with the same RHS then rule is redundant
+                LHSs = RHS_LHSs[item[4]]
+                if all(frozenset(x) in LHSs for x in combinations(item[3], len(item[3])-1)):
                     # Redundant do not add it to interesting association rules
                     continue
 
@@ -285,16 +1138,8 @@ def transform_association_rules(A_R,RedundantType=0):
         if RedundantType & 4 == 4:
             # If RHS length > 1
             if len(item[4])>1:
-                # Find all the RHS length-1 sub itemsets 
-                ssets = (set(x) for x in combinations(item[4], len(item[4])-1) )
-                i=0
-                # Count how many are the RHS length-1 sub itemsets participating to the A_R
-                for c in ssets:
-                    matchRule = [x[y] for x in A_R for y in range(0, len(x)) if x[y][4]==c and x[y][3]==item[3]]
-                    if len(matchRule)>0:
-                        i+=1   
-                # If RHS length-1 sub itemsets count is equal to LHS length then rule is redundant
-                if i==len(item[4]):
+                # If all the RHS length-1 sub itemsets participate to the A_R with the same LHS then rule is redundant
+                if all((item[3], frozenset(x)) in rule_confidences for x in combinations(item[4], len(item[4])-1)):
                     # Redundant do not add it to interesting association rules
                     continue
 
@@ -316,25 +1161,41 @@ def transform_association_rules(A_R,RedundantType=0):
 def webApriori(itemsets, **kwargs):
     """
     Executes Apriori algorithm and returns an association rules generator.
+    The rules hold item ids. Pass an itemsetManager in order to decode them
+    with its dictionary.
 
     Arguments:
         itemsets -- A itemset iterable object
-                        (eg. [['A', 'B'], ['B', 'C']]).
+                        (eg. [['A', 'B'], ['B', 'C']]) or an itemsetManager.
 
     Keyword arguments:
         min_support -- The minimum support of association_rules (float).
         min_confidence -- The minimum confidence of association_rules (float).
         min_lift -- The minimum lift of association_rules (float).
-        max_length -- The maximum length of the association_rule (integer).
+        max_length -- The maximum length of association_rule (integer).
+        backend -- The support counting backend ('set', 'bitset' or None for auto).
+        algorithm -- The frequent itemsets algorithm (see mining_algorithms).
+        max_rules -- The maximum count of association rules (integer). When reached
+                     '@' and the count are printed and the generation stops.
+        top_k -- Keep only the best top_k association rules instead (integer).
+                 Once top_k rules are kept the minimum support, confidence or lift
+                 is raised to the worst kept one when the rules are sorted by it.
+        sort_index -- The index in rule_sort_fields the top_k rules are ranked by (integer).
+        descending -- True ranks the largest values first (boolean).
     """
     # Parse the arguments.
     min_support = kwargs.get('min_support', 0.1)
     min_confidence = kwargs.get('min_confidence', 0.2)
     min_lift = kwargs.get('min_lift', 1.5)
     max_length = kwargs.get('max_length', 4)
+    backend = kwargs.get('backend')
+    algorithm = kwargs.get('algorithm', 'apriori')
+    rules_limit = kwargs.get('max_rules', max_rules)
+    top_k = kwargs.get('top_k')
+    sort_index = kwargs.get('sort_index', 3)
+    descending = kwargs.get('descending', True)
     
     rules_counter=0
-    global max_rules
 
     # Check arguments.
     if min_support <= 0:
@@ -345,24 +1206,60 @@ def webApriori(itemsets, **kwargs):
         raise ValueError('minimum lift can''t be negative number!!!') 
     if max_length < 2:
         raise ValueError('Rules max length can''t be negative number!!!') 
+    if algorithm not in mining_algorithms:
+        raise ValueError('Unknown algorithm ' + str(algorithm) + '!!!')
+    if rules_limit <= 0:
+        raise ValueError('Maximum rules must be a positive number!!!')
+    if top_k and not 2 <= sort_index < len(rule_sort_fields):
+        raise ValueError('Top rules can''t be ranked by ' + str(sort_index) + '!!!')
 
     # Calculate supports.
-    itemset_manager = itemsetManager.create(itemsets)
-    frequent_itemsets = generate_frequent_itemsets(itemset_manager, min_support, max_length=max_length)
-    
-    # Calculate rule stats.
-    for frequent_itemset in frequent_itemsets:
-        rule_statistics = list(gen_rule_statistics(itemset_manager, frequent_itemset, min_confidence=min_confidence, min_lift=min_lift))
+    itemset_manager = itemsetManager.create(itemsets, backend)
+    effective_support = min_support
+    frequent_itemsets = mining_algorithms[algorithm](itemset_manager, min_support, max_length=max_length,
+                                                     support_floor=lambda: effective_support)
+
+    top_rules = None
+    if top_k:
+        top_rules = topRules(top_k, rule_sort_fields[sort_index], descending)
+        # The floor of apriori is raised while mining, the other algorithms are filtered here.
+        frequent_itemsets = (x for x in frequent_itemsets if x.support >= effective_support)
+
+    # Calculate rule stats in batches of frequent itemsets.
+    for frequent_itemsets_batch in chunks(frequent_itemsets, rule_batch_size):
+        for rule_statistics in gen_rule_statistics_batch(itemset_manager, frequent_itemsets_batch, min_confidence=min_confidence, min_lift=min_lift):
         
-        if not rule_statistics:
-            continue  
+            if not rule_statistics:
+                continue  
 
-        rules_counter+=len(rule_statistics)
-        if rules_counter>=max_rules:
-            print('@' + '{:04d}'.format(max_rules))
-            break
+            if top_rules is not None:
+                for rule in rule_statistics:
+                    top_rules.push(rule)
+                continue
+
+            rules_counter+=len(rule_statistics)
+            if rules_counter>=rules_limit:
+                print('@' + '{:04d}'.format(rules_limit))
+                return
         
-        yield rule_statistics
+            yield rule_statistics
+
+        # Raise the floor of the ranking metric to the worst kept top rule.
+        # Support and leverage of a rule never exceed the support of its itemset.
+        if top_rules is not None and top_rules.descending and top_rules.threshold is not None:
+            threshold = top_rules.threshold
+            if top_rules.field in ('support', 'leverage'):
+                effective_support = max(effective_support, threshold)
+            elif top_rules.field == 'count':
+                effective_support = max(effective_support, threshold / itemset_manager.num_itemset)
+            elif top_rules.field == 'confidence':
+                min_confidence = max(min_confidence, threshold)
+            elif top_rules.field == 'lift':
+                min_lift = max(min_lift, threshold)
+
+    if top_rules is not None:
+        for rule in top_rules.rules():
+            yield [rule]
             
 
   
@@ -382,15 +1279,186 @@ Dataset types:
 ###################################################################
 # preprocessing section
 ###################################################################
-def prepare_records(datasetName, datasetSep, datasetType, public, *args):
+def group_transaction_codes(groups, items):
+    """
+    Returns a tuple (transactions, uniques) of the transactions of a 2-INV dataset.
+    transactions is a list of sorted integer arrays of item codes, one per group
+    (sorted by group) having more than one distinct item, and uniques the sorted
+    array of the item strings the codes refer to.
+
+    Arguments:
+        groups -- The group (primary key) column as a pandas Series.
+        items -- The items column as a pandas Series.
+    """
+    # Items as stripped strings and their codes, in the order of the sorted strings.
+    item_codes, uniques = pd.factorize(np.array([str(x).strip() for x in items.tolist()], dtype=object), sort=True)
+    # Missing groups get -1 and are dropped like the one row groups they used to be.
+    group_codes, x = pd.factorize(groups, sort=True)
+    valid = group_codes >= 0
+    group_codes = group_codes[valid].astype(np.int64)
+    item_codes = item_codes[valid].astype(np.int64)
+
+    # Distinct (group, item) pairs sorted by group and item.
+    pairs = np.unique(group_codes * len(uniques) + item_codes)
+    pair_groups = pairs // len(uniques)
+    pair_items = pairs % len(uniques)
+
+    # Split the pairs per group and keep the groups with more than one item.
+    starts = np.flatnonzero(np.diff(pair_groups, prepend=-1))
+    ends = np.append(starts[1:], len(pairs))
+    transactions = [pair_items[start:end] for start, end in zip(starts.tolist(), ends.tolist()) if end - start > 1]
+    return transactions, uniques
+
+def dataset_filepath(identity, datasetName, public):
+    """
+    Returns the path of a private (public=0) dataset of the user identity or of a public (public=1) dataset.
+    """
+    if public==0:
+        return os.path.join('datasets', identity, datasetName)
+    return os.path.join('public', datasetName)
+
+def dataset_records(dataset, datasetType, *args):
+    """
+    Returns the records of a dataset (or a chunk of it) of type 1 as a list
+    of lists. See prepare_records for the args of every type.
+    """
+    if int(datasetType)==1:
+                
+        # #use only the columns that the user has chosen
+        # if len(args)>0:
+        #     dataset = dataset[list(args)]
+
+        #pandas to list
+        records=dataset.values.tolist()
+
+        #remove nan elements from this 2-dimensional list'
+        records = [[y for y in x if str(y) != 'nan'] for x in records]
+
+        return(records)
+                
+    print("An error occurred: Unknown or unable to process the dataset. Its dataset type is 0 which means it can't be used for association rules mining as it can't produce intresting frequent itemsets.")
+    sys.exit()
+
+def si_matrix(dataset, *args):
+    """
+    Returns a tuple (matrix, items) of a 3-SI dataset (or a chunk of it). matrix is
+    a boolean NumPy array with a column per item, True where the cell differs from
+    the absent value args[0] as a string, and items the item (column name) of every
+    column. Only the distinct values of a column are turned into strings.
+    """
+    #no participating items declared. All the columns take part
+    if len(args)<2:
+        args=tuple(args[:1]) + tuple(dataset.columns)
+
+    #an item named as the absent value is absent
+    columns=[arg for arg in args[1:] if str(arg)!=args[0]]
+
+    matrix=np.zeros((len(dataset), len(columns)), dtype=bool)
+    for j, column in enumerate(columns):
+        values=dataset[column]
+        absents=[x for x in pd.unique(values) if str(x)==args[0]]
+        matrix[:, j]=~values.isin(absents).to_numpy()
+
+    return matrix, [str(arg) for arg in columns]
+
+def noa_codes(dataset, *args):
+    """
+    Returns a tuple (codes, items, item_columns) of a 4-NOA dataset (or a chunk of it)
+    for itemsetManager.add_columns. Every column is factorized, so only its distinct
+    values are turned into 'column=value' items, and codes holds the item index of
+    every cell (fixed width rows of one item per column).
+    """
+    #no participating items declared. All the columns take part
+    if len(args)==0:
+        args=tuple(dataset.columns)
+
+    codes=np.empty((len(dataset), len(args)), dtype=np.int64)
+    items=[]
+    item_columns=[]
+    for j, arg in enumerate(args):
+        column_codes, uniques=pd.factorize(dataset[arg], use_na_sentinel=False)
+        codes[:, j]=column_codes + len(items)
+        items.extend(str(arg) + '=' + str(x) for x in uniques)
+        item_columns.extend([j] * len(uniques))
+
+    return codes, items, item_columns
+
+def dataset_usecols(datasetType, *args):
+    """
+    Returns the columns of a dataset that take part in the records of its type
+    or None for all the columns. See prepare_records for the args of every type.
+    """
+    if datasetType==2:
+        return [args[0], args[1]]
+    if datasetType==3 and len(args)>=2:
+        #an item named as the absent value is absent
+        return [arg for arg in args[1:] if str(arg)!=args[0]]
+    if datasetType==4 and len(args)>0:
+        return list(args)
+    return None
+
+def transactions_cache_path(identity, datasetName, public):
+    """
+    Returns the path of the transactions cache of a dataset, next to its metadata file.
+    """
+    if public==0:
+        filepath=os.path.join('output', identity)
+    else:
+        filepath=os.path.join('output', identity, 'p')
+    return os.path.join(filepath, os.path.splitext(datasetName)[0] + '.npz')
+
+def transactions_cache_key(identity, datasetName, datasetSep, datasetType, public, *args):
+    """
+    Returns the key (JSON string) of the transactions cache of a dataset. A cache
+    is valid while the dataset file and the preprocessing parameters are unchanged.
+    """
+    stat=os.stat(dataset_filepath(identity, datasetName, public))
+    metaDataFile=Metadata.Metadata().readMetadataFile(identity, datasetName, public)
+    return json.dumps({'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'delimiter': datasetSep,
+                       'datasetType': datasetType, 'hasHeader': metaDataFile['hasHeader'],
+                       'args': list(args), 'max_items': max_items}, default=str)
+
+def load_transactions_cache(identity, datasetName, datasetSep, datasetType, public, *args):
+    """
+    Returns the itemsetManager of the transactions cache of a dataset or None if
+    there is no valid cache.
+    """
+    filepath=transactions_cache_path(identity, datasetName, public)
+    if not os.path.exists(filepath):
+        return None
+    try:
+        with np.load(filepath) as arrays:
+            if str(arrays['key'])!=transactions_cache_key(identity, datasetName, datasetSep, datasetType, public, *args):
+                return None
+            return itemsetManager.from_arrays(arrays)
+    except Exception:
+        # A broken cache is rebuilt.
+        return None
+
+def save_transactions_cache(itemset_manager, identity, datasetName, datasetSep, datasetType, public, *args):
+    """
+    Stores the index of itemset_manager as the transactions cache of a dataset (compressed npz).
+    """
+    filepath=transactions_cache_path(identity, datasetName, public)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    key=transactions_cache_key(identity, datasetName, datasetSep, datasetType, public, *args)
+    # Written to a temp file of its own and renamed, so a concurrent run never reads
+    # half a file and two runs caching the same dataset don't write the same file.
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(filepath), suffix='.npz', delete=False) as file:
+        tempFilepath=file.name
+    try:
+        np.savez_compressed(tempFilepath, key=np.array(key), **itemset_manager.to_arrays())
+        os.replace(tempFilepath, filepath)
+    except Exception:
+        os.remove(tempFilepath)
+        raise
+
+def prepare_records(identity, datasetName, datasetSep, datasetType, public, *args):
     global max_items
 
     try:
 
-        if public==0:
-            filepath=os.path.join('datasets', identity, datasetName)
-        else:
-            filepath=os.path.join('public', datasetName)
+        filepath=dataset_filepath(identity, datasetName, public)
 
         metadataInst=Metadata.Metadata()
         metaDataFile=metadataInst.readMetadataFile(identity,datasetName,public)
@@ -400,94 +1468,113 @@ def prepare_records(datasetName, datasetSep, datasetType, public, *args):
             args=args[0:max_items+1]
 
         #Read the dataset from file
-        dataset=Global.readDataset(filepath, sep=datasetSep, encoding='utf-8-sig', hasHeader=metaDataFile['hasHeader'])
+        dataset=Global.readDataset(filepath, sep=datasetSep, encoding='utf-8-sig', hasHeader=metaDataFile['hasHeader'], usecols=dataset_usecols(datasetType, *args))
         if not isinstance(dataset, pd.DataFrame):
             print(f"An error occurred: Could not read dataset! {e}")     
             sys.exit
 
-        if int(datasetType)==1:
-                    
-            # #use only the columns that the user has chosen
-            # if len(args)>0:
-            #     dataset = dataset[list(args)]
-
-            #pandas to list
-            records=dataset.values.tolist()
-
-            #remove nan elements from this 2-dimensional list'
-            records = [[y for y in x if str(y) != 'nan'] for x in records]
-
-            return(records)
-                
-        elif datasetType==2:
+        if datasetType==2:
 
             groupCol = args[0]
             itemsCol = args[1]
 
             dataset = dataset[[groupCol, itemsCol]]
-            
-            datasetSorted=dataset.sort_values(by=groupCol)
-
-            TempInv=''
-            records=[]
-            setrec=set()
-            for index, row in datasetSorted.iterrows():
-                if TempInv!=row[groupCol]:
-                    if len(setrec)>1:
-                        records.append(sorted(setrec))
-                    setrec=set()
-                    setrec.add(str(row[itemsCol]).strip())
-                    TempInv=row[groupCol]
-                else:
-                    setrec.add(str(row[itemsCol]).strip())
-                    
-
-            if len(setrec)>1:
-                records.append(sorted(setrec))
-                
-            return(records)
-                    
-        elif datasetType==3:
-            
-            dataset = dataset[list(args[1:])]
-            
-            #put the name of product in item#
-            for arg in args[1:]:
-                dataset[arg]=[str(arg) if str(x)!=args[0] else args[0] for x in dataset[arg]]
-            
-            #pandas to list
-            records=dataset.values.tolist()
-            #remove nan elements from this 2-dimensional list in order to be transformed as a dataset type 1-MBL'
-            records = [[y for y in x if str(y) != args[0]] for x in records]
-            return(records)
-                                
-        elif datasetType==4:
-                
-            dataset = dataset[list(args)]
-            
-            for arg in args:
-                dataset[arg] = arg + '=' + dataset[arg].astype(str)
-            
-            records=dataset.values.tolist()
-            return(records)
-                
-        else:
-            print("An error occurred: Unknown or unable to process the dataset. Its dataset type is 0 which means it can't be used for association rules mining as it can't produce intresting frequent itemsets.")
-            sys.exit()
+
+            #the item codes of the groups are the transactions, decoded only in the rules
+            itemset_manager=itemsetManager([])
+            itemset_manager.add_codes(*group_transaction_codes(dataset[groupCol], dataset[itemsCol]))
+            itemset_manager.sort_items()
+            return itemset_manager
+
+        if datasetType==3:
+
+            #the columns of the boolean matrix are the transaction indexes of the items
+            itemset_manager=itemsetManager([])
+            itemset_manager.add_matrix(*si_matrix(dataset, *args))
+            itemset_manager.sort_items()
+            return itemset_manager
+
+        if datasetType==4:
+
+            #the (column, value) pairs of the factorized columns are the items
+            itemset_manager=itemsetManager([])
+            itemset_manager.add_columns(*noa_codes(dataset, *args))
+            itemset_manager.sort_items()
+            return itemset_manager
+
+        return dataset_records(dataset, datasetType, *args)
 
     except Exception as e:
         print(f"An error occurred: {e}")     
         sys.exit()       
      
+def stream_records(identity, datasetName, datasetSep, datasetType, public, *args):
+    """
+    Returns the records of a dataset like prepare_records, streamed into an
+    itemsetManager (its records count is len()) read stream_chunk_rows lines
+    at a time, so only a chunk of the raw dataset is kept in memory.
+    The 2-INV groups are collected as sets of items until the end of the dataset.
+    """
+    global max_items
+
+    try:
+
+        filepath=dataset_filepath(identity, datasetName, public)
+
+        metadataInst=Metadata.Metadata()
+        metaDataFile=metadataInst.readMetadataFile(identity,datasetName,public)
 
+        if len(args)>max_items:
+            print('Max column limit exceeded (' + str(max_items) + '). Only the first ' + str(max_items) + ' of the ' + str(len(args)) + ' columns will be processed.')
+            args=args[0:max_items+1]
+
+        if datasetType not in (1, 2, 3, 4):
+            return dataset_records(None, datasetType, *args)
+
+        itemset_manager=itemsetManager([])
+        groups={}
+        # The chunks are read with the dtypes of the whole dataset, so their values (the items and the 2-INV
+        # groups) are the ones prepare_records reads, whatever the dtypes pandas would infer for a chunk.
+        usecols=dataset_usecols(datasetType, *args)
+        dtype=Global.readDatasetDtypes(filepath, sep=datasetSep, encoding='utf-8-sig', hasHeader=metaDataFile['hasHeader'], chunkSize=stream_chunk_rows, usecols=usecols)
+        for dataset in Global.readDataset(filepath, sep=datasetSep, encoding='utf-8-sig', hasHeader=metaDataFile['hasHeader'], chunkSize=stream_chunk_rows, usecols=usecols, dtype=dtype):
+            if datasetType==2:
+                # Missing groups were one item groups.
+                for group, item in zip(dataset[args[0]].tolist(), dataset[args[1]].tolist()):
+                    if not pd.isna(group):
+                        groups.setdefault(group, set()).add(str(item).strip())
+            elif datasetType==3:
+                itemset_manager.add_matrix(*si_matrix(dataset, *args))
+            elif datasetType==4:
+                itemset_manager.add_columns(*noa_codes(dataset, *args))
+            else:
+                itemset_manager.add_itemsets(dataset_records(dataset, datasetType, *args))
+
+        if datasetType==2:
+            itemset_manager.add_itemsets(sorted(groups[group]) for group in sorted(groups) if len(groups[group])>1)
+
+        # The ids follow the sorted order of the items as if created with all the records.
+        itemset_manager.sort_items()
+        return itemset_manager
+
+    except Exception as e:
+        print(f"An error occurred: {e}")     
+        sys.exit()       
 
 ##################################################################################
 # output operations
 ##################################################################################
 
-def output_association_rules(association_results, sort_index, descending=True, fileName=None, public=0, **kwargs):
+def output_association_rules(association_results, sort_index, descending=True, fileName=None, public=0, identity=None, **kwargs):
     try:
          
+        # The rules hold item ids. Decode them before sorting by LHS/RHS.
+        item_dictionary = kwargs.get('item_dictionary')
+        if item_dictionary is not None:
+            for arule in association_results:
+                arule[0] = item_dictionary.decode_itemset(arule[0])
+                arule[1] = item_dictionary.decode_itemset(arule[1])
+
         association_results.sort(reverse=descending, key=lambda x: x[sort_index])
 
         records = kwargs.get('records')
@@ -514,15 +1601,18 @@ def output_association_rules(association_results, sort_index, descending=True, f
             Hlist = ['LHS', 'RHS', 'Confidence', 'Lift', 'Conviction', 'Leverage', 'LHS_Count', 'LHS_Support', 'RHS_Count', 'RHS_Support', 'Support', 'Count'] 
             dictRules = {}
             
-            dictRules['min_support'] = min_support
-            dictRules['min_confidence'] = min_confidence
-            dictRules['min_lift'] = min_lift
-            dictRules['max_length'] = max_length
-            dictRules['ssort'] = ssort
-            dictRules['datasetName'] = datasetName
+            dictRules['min_support'] = kwargs.get('min_support')
+            dictRules['min_confidence'] = kwargs.get('min_confidence')
+            dictRules['min_lift'] = kwargs.get('min_lift')
+            dictRules['max_length'] = kwargs.get('max_length')
+            dictRules['ssort'] = kwargs.get('ssort')
+            dictRules['datasetName'] = fileName
             dictRules['public'] = public
-            dictRules['redundantRemoveType'] = redundantRemoveType
-            dictRules['datasetArgs'] = datasetArgs
+            dictRules['redundantRemoveType'] = kwargs.get('redundantRemoveType')
+            dictRules['algorithm'] = kwargs.get('algorithm')
+            dictRules['max_rules'] = kwargs.get('max_rules', max_rules)
+            dictRules['top_k'] = kwargs.get('top_k')
+            dictRules['datasetArgs'] = kwargs.get('datasetArgs')
             
             dictRules['Records'] = records
             dictRules['RecordsCreationTime'] = '{0:.3f}'.format(recordTime)
@@ -545,6 +1635,161 @@ def output_association_rules(association_results, sort_index, descending=True, f
         sys.exit()       
 
 
+def retrieve_rules(identity, datasetName, public=0):
+    """
+    Mines and prints the association rules of a dataset with the parameters of its metadata file,
+    as the command line does. Called by the workers of miningService.py too.
+
+    Arguments:
+        identity -- The identity of the user
+        datasetName -- The file name of the dataset
+        public -- 0 private dataset, 1 public dataset
+    """
+    try:
+
+        #Read dataset's metadatafile to retrieve its attributes. If not exists then it will AutoML create it.
+        metadataInst=Metadata.Metadata()
+        jsonData=metadataInst.readMetadataFile(identity, datasetName, public)
+        if not {'delimiter', 'datasetType', 'hasHeader'}.issubset(jsonData):
+            jsonData=metadataInst.createMetadataFile(identity, datasetName, public)
+        if jsonData['datasetType']==3 and not 'absentValue' in jsonData:
+            jsonData=metadataInst.createMetadataFile(identity, datasetName, public)
+    
+        if not 'delimiter' in jsonData:
+            print("An error occurred: Could not retrieve the delimiter of the dataset!")
+            return  
+
+        if not 'datasetType' in jsonData:
+            print("An error occurred: Could not retrieve the dataset type of the dataset!") 
+            return    
+
+        if not 'hasHeader' in jsonData:
+            print("An error occurred: Could not retrieve the dataset has header or not!") 
+            return 
+        elif jsonData['hasHeader'] and not 'header' in jsonData:
+            print("An error occurred: Could not retrieve the dataset's header!") 
+            return 
+
+        if jsonData['datasetType']==3 and not 'absentValue' in jsonData:
+            print("An error occurred: Could not retrieve the absent value of 3-SI dataset!")
+            return  
+
+        datasetSep=jsonData['delimiter']
+        datasetType=int(jsonData['datasetType'])
+        hasHeader=bool(jsonData['hasHeader'])
+
+        min_support=0.01
+        if 'min_support' in jsonData:
+            min_support=jsonData['min_support']
+
+        min_confidence=0.2
+        if 'min_confidence' in jsonData:
+            min_confidence=jsonData['min_confidence']
+
+        min_lift=1.5
+        if 'min_lift' in jsonData:
+            min_lift=jsonData['min_lift']
+
+        max_length=2
+        if 'max_length' in jsonData:
+            max_length=jsonData['max_length']
+
+        #sort_order
+        #0 by LHS, 1 by RHS, 2 by confidence, 3 by lift, 4 by conviction, 5 by LHS support, 6 by RHS support, 7 by rule support 
+        #negatives meaning descending
+        ssort=-3
+        if 'ssort' in jsonData:
+            ssort=jsonData['ssort']
+
+        '''
+        bitwise 0 non redundant removal
+        bitwise 1 Interchange the antecedent/LHS and consequence/RHS case 
+        bitwise 2 Redundant Rules with Fixed Consequence/RHS
+        bitwise 4 Redundant Rules with Fixed Antecedent/LHS
+        #output to to both console and file if datasetName is given
+        '''
+        redundantRemoveType=0 
+        if 'redundantRemoveType' in jsonData:
+            redundantRemoveType=jsonData['redundantRemoveType']
+
+        ssort=-3
+        if 'ssort' in jsonData:
+            ssort=jsonData['ssort']
+
+        #frequent itemsets algorithm: apriori, fpgrowth or eclat
+        algorithm='apriori'
+        if 'algorithm' in jsonData:
+            algorithm=jsonData['algorithm']
+
+        #maximum count of association rules
+        rules_limit=max_rules
+        if 'max_rules' in jsonData:
+            rules_limit=int(jsonData['max_rules'])
+
+        #0 all the rules (up to max_rules), >0 only the top_k rules by ssort
+        top_k=0
+        if 'top_k' in jsonData:
+            top_k=int(jsonData['top_k'])
+
+        participatingItems=[]
+        if 'participatingItems' in jsonData and isinstance(jsonData['participatingItems'], list):
+            participatingItems=jsonData['participatingItems'] 
+
+        #Time starts here
+        #################
+        recordTime=time()
+        #################
+
+        #prepare_records arguments per dataset type (see Dataset types above)
+        datasetArgs=participatingItems
+        if datasetType==2:
+            datasetArgs=[jsonData['groupItem'], jsonData['valueItem']]
+        elif datasetType==3:
+            datasetArgs=[jsonData['absentValue']] + participatingItems
+
+        #the transactions cache skips the parsing while the dataset and its preprocessing parameters are unchanged
+        records=load_transactions_cache(identity, datasetName, datasetSep, datasetType, public, *datasetArgs)
+        if records is None:
+            if os.path.getsize(dataset_filepath(identity, datasetName, public))>=stream_min_bytes:
+                records=stream_records(identity, datasetName, datasetSep, datasetType, public, *datasetArgs)
+            else:
+                records=prepare_records(identity, datasetName, datasetSep, datasetType, public, *datasetArgs)
+
+            if records:
+                records=itemsetManager.create(records)
+                try:
+                    save_transactions_cache(records, identity, datasetName, datasetSep, datasetType, public, *datasetArgs)
+                except Exception:
+                    #no cache, the next run parses the dataset again
+                    pass
+        
+        if records:
+
+            recordTime=time()-recordTime
+
+            assocTime=time()
+            itemset_manager = itemsetManager.create(records)
+            descending=False
+            if ssort<0:
+                descending=True
+
+            association_results = list(webApriori(itemset_manager, min_support=min_support, min_confidence=min_confidence, min_lift=min_lift, max_length=max_length, algorithm=algorithm, max_rules=rules_limit, top_k=top_k, sort_index=abs(ssort), descending=descending))
+            association_results = transform_association_rules(association_results,redundantRemoveType)
+            assocTime=time()-assocTime
+
+            output_association_rules(association_results, sort_index=abs(ssort), descending=descending, fileName=datasetName, public=public, identity=identity,
+                                     records=len(records), recordTime=recordTime, rulesCount=len(association_results), assocTime=assocTime, item_dictionary=itemset_manager.dictionary,
+                                     min_support=min_support, min_confidence=min_confidence, min_lift=min_lift, max_length=max_length, ssort=ssort,
+                                     redundantRemoveType=redundantRemoveType, algorithm=algorithm, max_rules=rules_limit, top_k=top_k, datasetArgs=datasetArgs)
+
+        else:
+            print("An error occurred: Could not retrieve records capable for frequent itemsets or Association Rules Mining")
+    
+    except Exception as e:
+        print(f"An error occurred: {e}")     
+        return
+
+
 ###########
 ###########
 ###########
@@ -569,145 +1814,37 @@ Dataset types:
 '''
 
 
-#identity
-identity=None
-if len(sys.argv)>1:
-    try:
-        identity=str(sys.argv[1])
-    except:
-        print("An error occurred: Could not retrieve identity of the user!")
+if __name__ == '__main__':
+
+    #identity
+    identity=None
+    if len(sys.argv)>1:
+        try:
+            identity=str(sys.argv[1])
+        except:
+            print("An error occurred: Could not retrieve identity of the user!")
+            sys.exit()
+    else:        
+        print("An error occurred: User identity not given!")
         sys.exit()
-else:        
-    print("An error occurred: User identity not given!")
-    sys.exit()
 
-if len(sys.argv)>2:
-    if len(sys.argv[2])>0:
-        datasetName=sys.argv[2]	
-    else:
+    if len(sys.argv)>2:
+        if len(sys.argv[2])>0:
+            datasetName=sys.argv[2]	
+        else:
+            print("An error occurred: Dataset name not given!")
+            sys.exit()
+    else:        
         print("An error occurred: Dataset name not given!")
         sys.exit()
-else:        
-    print("An error occurred: Dataset name not given!")
-    sys.exit()
-
-#0=private, 1=public
-public=0
-if len(sys.argv)>3:
-	try:
-		public=int(sys.argv[3])
-	except:
-		public=0 # Default is 0 private Dataset.
-
-
-#Main Program
-try:
-
-    #Read dataset's metadatafile to retrieve its attributes. If not exists then it will AutoML create it.
-    metadataInst=Metadata.Metadata()
-    jsonData=metadataInst.readMetadataFile(identity, datasetName, public)
-    if not {'delimiter', 'datasetType', 'hasHeader'}.issubset(jsonData):
-        jsonData=metadataInst.createMetadataFile(identity, datasetName, public)
-    if jsonData['datasetType']==3 and not 'absentValue' in jsonData:
-        jsonData=metadataInst.createMetadataFile(identity, datasetName, public)
-    
-    if not 'delimiter' in jsonData:
-        print("An error occurred: Could not retrieve the delimiter of the dataset!")
-        sys.exit()  
-
-    if not 'datasetType' in jsonData:
-        print("An error occurred: Could not retrieve the dataset type of the dataset!") 
-        sys.exit()    
-
-    if not 'hasHeader' in jsonData:
-        print("An error occurred: Could not retrieve the dataset has header or not!") 
-        sys.exit() 
-    elif jsonData['hasHeader'] and not 'header' in jsonData:
-        print("An error occurred: Could not retrieve the dataset's header!") 
-        sys.exit() 
-
-    if jsonData['datasetType']==3 and not 'absentValue' in jsonData:
-        print("An error occurred: Could not retrieve the absent value of 3-SI dataset!")
-        sys.exit()  
-
-    datasetSep=jsonData['delimiter']
-    datasetType=int(jsonData['datasetType'])
-    hasHeader=bool(jsonData['hasHeader'])
-
-    min_support=0.01
-    if 'min_support' in jsonData:
-        min_support=jsonData['min_support']
-
-    min_confidence=0.2
-    if 'min_confidence' in jsonData:
-        min_confidence=jsonData['min_confidence']
-
-    min_lift=1.5
-    if 'min_lift' in jsonData:
-        min_lift=jsonData['min_lift']
-
-    max_length=2
-    if 'max_length' in jsonData:
-        max_length=jsonData['max_length']
-
-    #sort_order
-    #0 by LHS, 1 by RHS, 2 by confidence, 3 by lift, 4 by conviction, 5 by LHS support, 6 by RHS support, 7 by rule support 
-    #negatives meaning descending
-    ssort=-3
-    if 'ssort' in jsonData:
-        ssort=jsonData['ssort']
-
-    '''
-    bitwise 0 non redundant removal
-    bitwise 1 Interchange the antecedent/LHS and consequence/RHS case 
-    bitwise 2 Redundant Rules with Fixed Consequence/RHS
-    bitwise 4 Redundant Rules with Fixed Antecedent/LHS
-    #output to to both console and file if datasetName is given
-    '''
-    redundantRemoveType=0 
-    if 'redundantRemoveType' in jsonData:
-        redundantRemoveType=jsonData['redundantRemoveType']
-
-    ssort=-3
-    if 'ssort' in jsonData:
-        ssort=jsonData['ssort']
-
-    participatingItems=[]
-    if 'participatingItems' in jsonData:
-        participatingItems=jsonData['participatingItems'] 
-
-    #Time starts here
-    #################
-    recordTime=time()
-    #################
 
-    if datasetType==2:
-        
+    #0=private, 1=public
+    public=0
+    if len(sys.argv)>3:
+        try:
+            public=int(sys.argv[3])
+        except:
+            public=0 # Default is 0 private Dataset.
 
-    records=prepare_records(datasetName, datasetSep, datasetType, public, participatingItems)
-        
-    if records:
-
-        recordTime=time()-recordTime
-
-        assocTime=time()
-        association_results = list(webApriori(records, min_support=min_support, min_confidence=min_confidence, min_lift=min_lift, max_length=max_length))
-        association_results = transform_association_rules(association_results,redundantRemoveType)
-        assocTime=time()-assocTime
-
-        descending=False
-        if ssort<0:
-            descending=True
-
-        output_association_rules(association_results, sort_index=abs(ssort), descending=descending, fileName=datasetName, public=public, records=len(records), recordTime=recordTime, rulesCount=len(association_results), assocTime=assocTime)
-
-    else:
-        print("An error occurred: Could not retrieve records capable for frequent itemsets or Association Rules Mining")
-    
-except Exception as e:
-    print(f"An error occurred: {e}")     
-    sys.exit()       
-
-
-    
-     
\ No newline at end of file
+    #Main Program
+    retrieve_rules(identity, datasetName, public)
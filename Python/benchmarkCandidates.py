@@ -0,0 +1,89 @@
+"""
+benchmarkCandidates.py - benchmarks the prefix join candidate generation of
+Main05.extract_next_candidates against the former combinations based one
+on the public 1-MBL datasets.
+Usage: python benchmarkCandidates.py [min_support] [max_length] [dataset ...]
+"""
+
+import os
+import sys
+from itertools import combinations
+from time import time
+import Main05
+
+#------------------------------
+#command line arguments section
+#------------------------------
+
+min_support=0.005
+if len(sys.argv)>1:
+    min_support=float(sys.argv[1])
+
+max_length=4
+if len(sys.argv)>2:
+    max_length=int(sys.argv[2])
+
+# (dataset name, delimiter) of public 1-MBL datasets
+datasets=[('retail.txt', ' '), ('store_data.csv', ','), ('groceries.csv', ',')]
+if len(sys.argv)>3:
+    datasets=[(x, ' ' if x.endswith('.txt') else ',') for x in sys.argv[3:]]
+
+#------------------------------
+#end command line arguments section
+#------------------------------
+
+def extract_next_candidates_combinations(prev_candidates, length):
+    """
+    The former extract_next_candidates. Enumerates all the combinations of the
+    items of the previous candidates and prunes them.
+    """
+    item_set = set()
+    for candidate in prev_candidates:
+        for item in candidate:
+            item_set.add(item)
+    items = sorted(item_set)
+
+    tmp_next_candidates = (frozenset(x) for x in combinations(items, length))
+
+    if length < 3:
+        return list(tmp_next_candidates)
+
+    next_candidates = [
+        candidate for candidate in tmp_next_candidates
+        if all(
+            True if frozenset(x) in prev_candidates else False
+            for x in combinations(candidate, length - 1))
+    ]
+    return next_candidates
+
+def read_records(datasetName, sep):
+    with open(os.path.join('public', datasetName), encoding='utf-8-sig') as f:
+        return [[x for x in line.strip().split(sep) if x] for line in f if line.strip()]
+
+for datasetName, sep in datasets:
+    records=read_records(datasetName, sep)
+    itemset_manager=Main05.itemsetManager(records)
+    print(f"{datasetName}: {itemset_manager.num_itemset} records, {len(itemset_manager.items)} items, min_support {min_support}")
+
+    frequent=set(x for x in itemset_manager.initial_candidates()
+                 if itemset_manager.calc_count(x)/itemset_manager.num_itemset>=min_support)
+    for length in range(2, max_length+1):
+        if not frequent:
+            break
+
+        t=time()
+        old_candidates=extract_next_candidates_combinations(frequent, length)
+        old_time=time()-t
+
+        t=time()
+        new_candidates=Main05.extract_next_candidates(frequent, length)
+        new_time=time()-t
+
+        if set(old_candidates)!=set(new_candidates):
+            print(f"  level {length}: candidates differ!!!")
+
+        print(f"  level {length}: {len(frequent)} frequent, {len(new_candidates)} candidates, "
+              f"combinations {old_time:.3f}s, prefix join {new_time:.3f}s, speedup x{old_time/max(new_time, 1e-6):.1f}")
+
+        frequent=set(x for x in new_candidates
+                     if itemset_manager.calc_count(x)/itemset_manager.num_itemset>=min_support)
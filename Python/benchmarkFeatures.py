@@ -0,0 +1,103 @@
+"""
+benchmarkFeatures.py - benchmarks the column type classification of
+datasetTypeDetection.columnTypes against the former one of _datasetFeatures_a
+on the 500 rows sample of the public datasets and reports the slowest columns.
+Usage: python benchmarkFeatures.py [dataset ...]
+"""
+
+import os
+import sys
+import warnings
+from glob import glob
+from time import perf_counter
+import pandas as pd
+import csvMy as csv
+import datasetTypeDetection as df
+import Global
+
+#------------------------------
+#command line arguments section
+#------------------------------
+
+nRows=500
+
+# the slowest columns reported per dataset
+reportColumns=5
+
+datasets=sorted(os.path.basename(x) for x in glob(os.path.join('public', '3*')))
+if len(sys.argv)>1:
+    datasets=sys.argv[1:]
+
+#------------------------------
+#end command line arguments section
+#------------------------------
+
+def column_type_former(dfcol):
+    """
+    The former column classification of _datasetFeatures_a. Every check runs on the whole column.
+    """
+    if (dfcol.isin([0, 1]).all() or
+        dfcol.isin(['t', 'f']).all() or
+        dfcol.isin(['T', 'F']).all() or
+        dfcol.isin(['y', 'n']).all() or
+        dfcol.isin(['Y', 'N']).all() or
+        dfcol.isin(['YES', 'NO']).all() or
+        dfcol.isin(['yes', 'no']).all() or
+        dfcol.isin(['Yes', 'No']).all() or
+        dfcol.isin(['true', 'false']).all() or
+        dfcol.isin(['TRUE', 'FALSE']).all() or
+        dfcol.isin(['True', 'False']).all() or
+        dfcol.isin([True, False]).all()
+       ):
+        return 'bool'
+
+    try:
+        tempColumn = pd.to_numeric(dfcol, errors='raise')
+        dfint=dfcol.astype('int64')
+        return 'integer' if dfint.sum()==dfcol.sum() else 'numeric'
+    except ValueError:
+        try:
+            dfc=dfcol.str.replace('.', '')
+            dfc=dfc.str.replace(',', '.')
+            dfc=pd.to_numeric(dfc, errors='raise')
+            dfint=dfc.astype('int64')
+            return 'integer' if dfint.sum()==dfc.sum() else 'numeric'
+        except ValueError:
+            try:
+                tempColumn = pd.to_datetime(dfcol, errors='raise', format='mixed')
+                return 'date'
+            except ValueError:
+                return 'string'
+
+warnings.filterwarnings('ignore')
+
+for datasetName in datasets:
+    filepath=os.path.join('public', datasetName)
+    try:
+        lines=Global.readDatasetSample(filepath, nRows+1)
+        dialect, hasHeader, header, datasetType=csv.Sniffer().sniff_header(''.join(lines[:nRows]))
+        sample=Global.parseDatasetSample(''.join(lines), sep=dialect.delimiter, hasHeader=hasHeader, nRows=nRows)
+    except Exception as e:
+        print(f"{datasetName}: skipped ({e})")
+        continue
+
+    t=perf_counter()
+    try:
+        old_types=[column_type_former(sample[x].dropna()) for x in sample.columns]
+    except Exception as e:
+        old_types=[type(e).__name__]*sample.shape[1]
+    old_time=perf_counter()-t
+
+    t=perf_counter()
+    try:
+        new_types, seconds=df.columnTypes(sample)
+    except Exception as e:
+        new_types, seconds=[type(e).__name__]*sample.shape[1], [0.0]*sample.shape[1]
+    new_time=perf_counter()-t
+
+    print(f"{datasetName}: {sample.shape[0]} rows, {sample.shape[1]} columns, "
+          f"former {old_time:.3f}s, columnTypes {new_time:.3f}s, speedup x{old_time/max(new_time, 1e-6):.1f}")
+    if old_types!=new_types:
+        print("  column types differ!!!")
+    for seconds, name, colType in sorted(zip(seconds, sample.columns, new_types), key=lambda x: x[0], reverse=True)[:reportColumns]:
+        print(f"  {str(name)[:40]:40} {colType:8} {seconds*1000:.2f}ms")
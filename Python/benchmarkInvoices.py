@@ -0,0 +1,75 @@
+"""
+benchmarkInvoices.py - benchmarks the factorize based 2-INV transactions grouping of
+Main05.group_transaction_codes against the former iterrows based one of prepare_records
+on the public 2-INV datasets.
+Usage: python benchmarkInvoices.py [dataset [group column] [items column]]
+"""
+
+import os
+import sys
+from glob import glob
+from time import time
+import Global
+import Main05
+
+#------------------------------
+#command line arguments section
+#------------------------------
+
+# (dataset name, group column, items column) of the public 2-INV datasets.
+# A missing group column is the first column and a missing items column is the
+# item code column of the dataset (or its second column).
+datasets=[(os.path.basename(x), None, None) for x in sorted(glob(os.path.join('public', '2_*.csv')))]
+if len(sys.argv)>1:
+    args=sys.argv[1:]+[None, None]
+    datasets=[(args[0], args[1], args[2])]
+
+#------------------------------
+#end command line arguments section
+#------------------------------
+
+def group_transactions_iterrows(dataset, groupCol, itemsCol):
+    """
+    The former 2-INV grouping of prepare_records. Walks the sorted dataset row by row.
+    """
+    datasetSorted=dataset.sort_values(by=groupCol)
+
+    TempInv=''
+    records=[]
+    setrec=set()
+    for index, row in datasetSorted.iterrows():
+        if TempInv!=row[groupCol]:
+            if len(setrec)>1:
+                records.append(sorted(setrec))
+            setrec=set()
+            setrec.add(str(row[itemsCol]).strip())
+            TempInv=row[groupCol]
+        else:
+            setrec.add(str(row[itemsCol]).strip())
+
+    if len(setrec)>1:
+        records.append(sorted(setrec))
+
+    return records
+
+for datasetName, groupCol, itemsCol in datasets:
+    dataset=Global.readDataset(os.path.join('public', datasetName), sep=';', encoding='utf-8-sig', hasHeader=True)
+    groupCol=groupCol or dataset.columns[0]
+    itemsCol=itemsCol or ('Κωδικός Είδους' if 'Κωδικός Είδους' in dataset.columns else dataset.columns[1])
+    dataset=dataset[[groupCol, itemsCol]]
+    print(f"{datasetName}: {len(dataset)} lines, group {groupCol}, items {itemsCol}")
+
+    t=time()
+    old_records=group_transactions_iterrows(dataset, groupCol, itemsCol)
+    old_time=time()-t
+
+    t=time()
+    transactions, uniques=Main05.group_transaction_codes(dataset[groupCol], dataset[itemsCol])
+    new_time=time()-t
+
+    new_records=[uniques[transaction].tolist() for transaction in transactions]
+    if old_records!=new_records:
+        print("  transactions differ!!!")
+
+    print(f"  {len(new_records)} transactions, iterrows {old_time:.3f}s, "
+          f"factorize {new_time:.3f}s, speedup x{old_time/max(new_time, 1e-6):.1f}")
@@ -0,0 +1,95 @@
+"""
+benchmarkSniffer.py - benchmarks the one pass csvMy.Sniffer.sniff_header against the
+former sniff and has_header (which sniffed again) of csvMy.py at a former revision
+(the baseline commit by default) on the 500 lines sample of the public datasets.
+Usage: python benchmarkSniffer.py [revision [dataset ...]]
+"""
+
+import os
+import sys
+import types
+import subprocess
+from glob import glob
+from time import perf_counter
+import csvMy as csv
+import Global
+
+#------------------------------
+#command line arguments section
+#------------------------------
+
+nRows=500
+
+revision=''
+if len(sys.argv)>1:
+    revision=sys.argv[1]
+
+datasets=sorted(os.path.basename(x) for x in glob(os.path.join('public', '*')) if os.path.isfile(x))
+if len(sys.argv)>2:
+    datasets=sys.argv[2:]
+
+#------------------------------
+#end command line arguments section
+#------------------------------
+
+def load_former_csv(revision):
+    """
+    Returns the csvMy module of a git revision (the baseline commit for '') without writing it to the tree.
+    """
+    if not revision:
+        revision=subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], capture_output=True, text=True, check=True).stdout.split()[0]
+    source=subprocess.run(['git', 'show', revision + ':./csvMy.py'], capture_output=True, text=True, check=True).stdout
+    module=types.ModuleType('csvMyFormer')
+    exec(compile(source, 'csvMy.py@' + revision, 'exec'), module.__dict__)
+    return module
+
+class SnifferFormer:
+    """
+    The former sniffing of a sample: sniff, then has_header which sniffs the sample again.
+    """
+    def __init__(self, former_csv):
+        self.sniffer=former_csv.Sniffer()
+
+    def sniff_header(self, sample, delimiters=None):
+        dialect=self.sniffer.sniff(sample, delimiters)
+        hasHeader, header=self.sniffer.has_header(sample)
+        return dialect, hasHeader, header, dialect.datasetType
+
+def sniff_result(sniffer, sample):
+    """
+    The dialect attributes, the header guess and the dataset type of a sample, or the error.
+    """
+    try:
+        dialect, hasHeader, header, datasetType=sniffer.sniff_header(sample)
+        return (dialect.delimiter, dialect.quotechar, dialect.doublequote, dialect.skipinitialspace, hasHeader, header, datasetType)
+    except Exception as e:
+        return type(e).__name__
+
+former_csv=load_former_csv(revision)
+
+old_total=new_total=0.0
+for datasetName in datasets:
+    filepath=os.path.join('public', datasetName)
+    if Global.is_arff_file(filepath):
+        continue
+    try:
+        sample=''.join(Global.readDatasetSample(filepath, nRows))
+    except Exception as e:
+        print(f"{datasetName}: skipped ({e})")
+        continue
+
+    t=perf_counter()
+    old_result=sniff_result(SnifferFormer(former_csv), sample)
+    old_time=perf_counter()-t
+
+    t=perf_counter()
+    new_result=sniff_result(csv.Sniffer(), sample)
+    new_time=perf_counter()-t
+
+    old_total+=old_time
+    new_total+=new_time
+    print(f"{datasetName}: former {old_time*1000:.1f}ms, sniff_header {new_time*1000:.1f}ms, speedup x{old_time/max(new_time, 1e-6):.1f}")
+    if old_result!=new_result:
+        print("  sniffing differs!!!")
+
+print(f"all: former {old_total:.3f}s, sniff_header {new_total:.3f}s, speedup x{old_total/max(new_total, 1e-6):.1f}")
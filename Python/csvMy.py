@@ -12,7 +12,9 @@ from _csv import Error, __version__, writer, reader, register_dialect, \
 from _csv import Dialect as _Dialect
 
 from collections import OrderedDict
+from functools import lru_cache
 from io import StringIO
+import numpy as np
 
 __all__ = ["QUOTE_MINIMAL", "QUOTE_ALL", "QUOTE_NONNUMERIC", "QUOTE_NONE",
            "Error", "Dialect", "__doc__", "excel", "excel_tab",
@@ -165,6 +167,44 @@ try:
 except NameError:
     complex = float
 
+# The quoted field patterns of Sniffer._guess_quote_and_delimiter, compiled once, in the order they are tried
+_quoteRegexps = [re.compile(restr, re.DOTALL | re.MULTILINE) for restr in (
+    r'(?P<delim>[^\w\n"\'])(?P<space> ?)(?P<quote>["\']).*?(?P=quote)(?P=delim)', # ,".*?",
+    r'(?:^|\n)(?P<quote>["\']).*?(?P=quote)(?P<delim>[^\w\n"\'])(?P<space> ?)',   #  ".*?",
+    r'(?P<delim>[^\w\n"\'])(?P<space> ?)(?P<quote>["\']).*?(?P=quote)(?:$|\n)',   # ,".*?"
+    r'(?:^|\n)(?P<quote>["\']).*?(?P=quote)(?:$|\n)')]                            #  ".*?" (no delim, no space)
+
+@lru_cache(maxsize=64)
+def _doublequoteRegexp(delim, quote):
+    # The pattern of a doubled quote between delimiters, compiled once per (delimiter, quotechar)
+    return re.compile(
+                      r"((%(delim)s)|^)\W*%(quote)s[^%(delim)s\n]*%(quote)s[^%(delim)s\n]*%(quote)s\W*((%(delim)s)|$)" % \
+                      {'delim':re.escape(delim), 'quote':quote}, re.MULTILINE)
+
+def _frequencyTables(lines):
+    # The 7-bit ASCII characters (codes) found in the lines, their distinct frequencies (counts on a line), the
+    # (lines x characters) array of the index of the frequency of every character on every line and the
+    # (characters x frequencies) array of the first line of every frequency of a character
+    frequencies = _charFrequencies(lines)
+    chars = np.flatnonzero(frequencies.any(axis=0))
+    freqValues, freqIndex = np.unique(frequencies[:, chars], return_inverse=True)
+    freqIndex = freqIndex.reshape(len(lines), len(chars))
+    firstLine = np.full((len(chars), len(freqValues)), len(lines))
+    np.minimum.at(firstLine, (np.broadcast_to(np.arange(len(chars)), freqIndex.shape), freqIndex),
+                  np.broadcast_to(np.arange(len(lines))[:, None], freqIndex.shape))
+    return chars, freqValues, freqIndex, firstLine
+
+def _charFrequencies(lines):
+    # The (lines x 127) NumPy array of the count of every 7-bit ASCII character in every line.
+    # The lines are joined, taken once as code points and counted with one bincount
+    if len(lines) == 0:
+        return np.zeros((0, 127), dtype=np.int64)
+    codes = np.frombuffer('\n'.join(lines).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    newlines = codes == 10
+    lineIndex = np.cumsum(newlines)
+    keep = (codes < 127) & ~newlines
+    return np.bincount(lineIndex[keep] * 127 + codes[keep], minlength=len(lines) * 127).reshape(len(lines), 127)
+
 class Sniffer:
     '''
     "Sniffs" the format of a CSV file (i.e. delimiter, quotechar)
@@ -213,6 +253,18 @@ class Sniffer:
 
         return dialect
 
+    def sniff_header(self, sample, delimiters=None):
+        """
+        Returns the dialect, the header guess (hasHeader, header) of has_header and
+        the dataset type of the sample (dialect.datasetType, 1 for a 1-MBL Market Basket list)
+        from one sniffing of the sample
+        """
+
+        dialect = self.sniff(sample, delimiters)
+        hasHeader, header = self.has_header(sample, dialect)
+
+        return dialect, hasHeader, header, dialect.datasetType
+
     def _guess_quote_and_delimiter(self, data, delimiters):
         """
         Looks for text enclosed between two identical quotes
@@ -226,11 +278,10 @@ class Sniffer:
         """
 
         matches = []
-        for restr in (r'(?P<delim>[^\w\n"\'])(?P<space> ?)(?P<quote>["\']).*?(?P=quote)(?P=delim)', # ,".*?",
-                      r'(?:^|\n)(?P<quote>["\']).*?(?P=quote)(?P<delim>[^\w\n"\'])(?P<space> ?)',   #  ".*?",
-                      r'(?P<delim>[^\w\n"\'])(?P<space> ?)(?P<quote>["\']).*?(?P=quote)(?:$|\n)',   # ,".*?"
-                      r'(?:^|\n)(?P<quote>["\']).*?(?P=quote)(?:$|\n)'):                            #  ".*?" (no delim, no space)
-            regexp = re.compile(restr, re.DOTALL | re.MULTILINE)
+        # without a quote character none of the patterns can match
+        if '"' not in data and "'" not in data:
+            return ('', False, None, 0)
+        for regexp in _quoteRegexps:
             matches = regexp.findall(data)
             if matches:
                 break
@@ -275,11 +326,7 @@ class Sniffer:
 
         # if we see an extra quote between delimiters, we've got a
         # double quoted format
-        dq_regexp = re.compile(
-                               r"((%(delim)s)|^)\W*%(quote)s[^%(delim)s\n]*%(quote)s[^%(delim)s\n]*%(quote)s\W*((%(delim)s)|$)" % \
-                               {'delim':re.escape(delim), 'quote':quotechar}, re.MULTILINE)
-
-
+        dq_regexp = _doublequoteRegexp(delim, quotechar)
 
         if dq_regexp.search(data):
             doublequote = True
@@ -310,41 +357,36 @@ class Sniffer:
 
         data = list(filter(None, data.split('\n')))
 
-        ascii = [chr(c) for c in range(127)] # 7-bit ASCII
-        
-
         # build frequency tables
+        # The count of every 7-bit ASCII character on every line is taken at once (see _charFrequencies) and the
+        # frequencies of each character are kept as the lines count of each of its distinct frequencies.
+        # The tables are built for the first chunk, which decides for most of the datasets, and then for all the lines
         chunkLength = min(10, len(data))
         iteration = 0
-        charFrequency = {}
         modes = {}
         delims = {}
         start, end = 0, chunkLength
+        tableLines = 0
         while start < len(data):
             iteration += 1
-            for line in data[start:end]:
-                for char in ascii:
-                    metaFrequency = charFrequency.get(char, {})
-                    # must count even if frequency is 0
-                    freq = line.count(char)
-                    # value is the mode
-                    metaFrequency[freq] = metaFrequency.get(freq, 0) + 1
-                    charFrequency[char] = metaFrequency
-
-            for char in charFrequency.keys():
-                items = list(charFrequency[char].items())
-                if len(items) == 1 and items[0][0] == 0:
+            if tableLines < min(end, len(data)):
+                tableLines = chunkLength if iteration == 1 else len(data)
+                chars, freqValues, freqIndex, firstLine = _frequencyTables(data[:tableLines])
+                charIndex = np.broadcast_to(np.arange(len(chars)), freqIndex.shape)
+                charFrequency = np.zeros((len(chars), len(freqValues)), dtype=np.int64)
+                start = 0
+            charFrequency += np.bincount((charIndex[start:end] * len(freqValues) + freqIndex[start:end]).ravel(),
+                                         minlength=charFrequency.size).reshape(charFrequency.shape)
+            lines = min(end, len(data))
+
+            # get the mode of the frequencies and adjust it - subtract the sum of all other frequencies
+            modeCount = charFrequency.max(axis=1)
+            modeFreq = freqValues[np.where(charFrequency == modeCount[:, None], firstLine, lines).argmin(axis=1)]
+            for char, freq, count in zip(chars.tolist(), modeFreq.tolist(), modeCount.tolist()):
+                # a character not seen yet, only frequency 0
+                if freq == 0 and count == lines:
                     continue
-                # get the mode of the frequencies
-                if len(items) > 1:
-                    modes[char] = max(items, key=lambda x: x[1])
-                    # adjust the mode - subtract the sum of all
-                    # other frequencies
-                    items.remove(modes[char])
-                    modes[char] = (modes[char][0], modes[char][1]
-                                   - sum(item[1] for item in items))
-                else:
-                    modes[char] = items[0]
+                modes[chr(char)] = (freq, 2 * count - lines)
 
             # build a list of possible delimiters
             modeList = modes.items()
@@ -367,6 +409,10 @@ class Sniffer:
                                     data[0].count("%c " % delim))
                 return (delim, skipinitialspace, 0)
 
+            # the delimiter candidates are kept once found, the next chunks can't change them
+            if len(delims) > 1:
+                break
+
             # analyze another chunkLength lines
             start = end
             end += chunkLength
@@ -381,11 +427,9 @@ class Sniffer:
             min_count = 0
             result = None
 
+            text = '\n'.join(data)
             for char in possibles:
-                count=0
-                for line in data:
-                    pieces = line.split(char)
-                    count += len(pieces)-1
+                count = text.count(char)
                 # pieces = data[0].split(char)
                 # count = len(pieces)
 
@@ -446,7 +490,7 @@ class Sniffer:
         # items.sort()
         # delim = items[-1][1]
 
-    def has_header(self, sample):
+    def has_header(self, sample, dialect=None):
         # Creates a dictionary of types of data in each column. If any
         # column is of a single type (say, integers), *except* for the first
         # row, then the first row is presumed to be labels. If the type
@@ -456,7 +500,8 @@ class Sniffer:
         # Finally, a 'vote' is taken at the end for each column, adding or
         # subtracting from the likelihood of the first row being a header.
 
-        rdr = reader(StringIO(sample), self.sniff(sample))
+        # dialect is the already sniffed dialect of the sample, if any
+        rdr = reader(StringIO(sample), dialect or self.sniff(sample))
 
         header = next(rdr) # assume first row is header
 
@@ -464,6 +509,7 @@ class Sniffer:
         columnTypes = {}
         for i in range(columns): columnTypes[i] = None
 
+        valueTypes = {}
         checked = 0
         #Malliaridis 03/12/2023 start
         rowsWithDifferentNumberOfColumnsFromFirstRowColumns=0
@@ -480,15 +526,19 @@ class Sniffer:
 
             for col in list(columnTypes.keys()):
 
-                for thisType in [int, float, complex]:
-                    try:
-                        thisType(row[col])
-                        break
-                    except (ValueError, OverflowError):
-                        pass
-                else:
-                    # fallback to length of string
-                    thisType = len(row[col])
+                # the type of a value is found once, the values repeat across the rows and columns
+                thisType = valueTypes.get(row[col])
+                if thisType is None:
+                    for thisType in [int, float, complex]:
+                        try:
+                            thisType(row[col])
+                            break
+                        except (ValueError, OverflowError):
+                            pass
+                    else:
+                        # fallback to length of string
+                        thisType = len(row[col])
+                    valueTypes[row[col]] = thisType
 
                 if thisType != columnTypes[col]:
                     if columnTypes[col] is None: # add new column type
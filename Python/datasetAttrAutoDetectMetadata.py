@@ -1,87 +1,190 @@
 import sys
 import os
 import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import csvMy as csv
 import datasetTypeDetection as df
 import Global
 
 nRows=500
 
+def datasetMetadataFeatures(identity, datasetName, public=0):
+    #The features of a dataset in a worker process of Metadata.createMetadataFiles
+    features=Metadata().datasetMetadataFeatures(identity, datasetName, public)
+    if features==None:
+        return None
+    datasetAttributes, DFI, dialectType=features
+
+    #The features class of _datasetFeatures_a is local and can't be pickled back, its attributes are copied to an instance
+    DFIInst=df.datasetFeatures()
+    DFIInst.__dict__.update({x: y for x, y in vars(DFI).items() if not x.startswith('__')})
+    return datasetAttributes, DFIInst, dialectType
+
 class Metadata():
 
     def createMetadataFile(self, identity, datasetName, datasetType=-1, public=0):
 
-        if public==0:
-            filepath=os.path.join('datasets', str(identity), datasetName)
+        features=self.datasetMetadataFeatures(identity, datasetName, public)
+        if features==None:
+            print(f"Failed to detect dataset attributes for dataset '{datasetName}'.")
+            sys.exit()
+        datasetAttributes, DFI, dialectType=features
+
+        # Declare the predicted Dataset type
+        if dialectType==0:
+          datasetTypePredicted=int(df.datasetFeatures().AutoDetectType(DFI))
         else:
-            filepath=os.path.join('public', datasetName)	
+           datasetTypePredicted=int(dialectType)
 
-        if Global.is_arff_file(filepath):
-           dataset=Global.loadarfftoDataframe(filepath, encoding='utf-8-sig')
-           filepathcsv=os.path.join('temp',datasetName)
-           filepath=os.path.splitext(filepathcsv)[0] + '.csv'
-           dataset.to_csv(filepath,index=False)
+        return self.writeMetadataFile(identity, datasetName, datasetType, public, datasetAttributes, DFI, dialectType, datasetTypePredicted)
+
+    def createMetadataFiles(self, identity, datasetNames, datasetType=-1, public=0, processes=None):
+        #The metadata files of many datasets. The features are extracted in a process pool and the
+        #types of them all are predicted with one predict call. Returns {datasetName: metadata or error}
+
+        results={}
+        extracted=[]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures={executor.submit(datasetMetadataFeatures, identity, x, public): x for x in datasetNames}
+            for future in as_completed(futures):
+                datasetName=futures[future]
+                try:
+                    features=future.result()
+                except Exception as e:
+                    features=None
+                    results[datasetName]=f"An error occurred: {e}"
+                if features==None:
+                    results.setdefault(datasetName, f"Failed to detect dataset attributes for dataset '{datasetName}'.")
+                else:
+                    extracted.append((datasetName, features))
+
+        #in the order of the datasets, as the single dataset runs
+        order={x: i for i, x in enumerate(datasetNames)}
+        extracted.sort(key=lambda x: order[x[0]])
+
+        DFIs=[DFI for datasetName, (datasetAttributes, DFI, dialectType) in extracted if dialectType==0]
+        predicted=iter(df.datasetFeatures().AutoDetectTypes(DFIs) if len(DFIs)>0 else [])
+
+        for datasetName, (datasetAttributes, DFI, dialectType) in extracted:
+            datasetTypePredicted=int(next(predicted)) if dialectType==0 else int(dialectType)
+            try:
+                results[datasetName]=self.writeMetadataFile(identity, datasetName, datasetType, public, datasetAttributes, DFI, dialectType, datasetTypePredicted)
+            except Exception as e:
+                results[datasetName]=f"An error occurred: {e}"
+
+        return results
+
+    def datasetMetadataFeatures(self, identity, datasetName, public=0):
+        #The detected attributes, the features and the csvMy dataset type (0 when it is left to the model) of a dataset
+
+        filepath=self.datasetFilepath(identity, datasetName, public)
+
+        dialect, hasHeader, header, dialectType, lines, sample=self.sniffDataset(filepath)
 
         datasetAttributes = {}
+        datasetAttributes['hasHeader']=hasHeader
+        datasetAttributes['header']=header
+        datasetAttributes['delimiter']=dialect.delimiter
 
-        with open(filepath, encoding='utf-8-sig') as f:
-            s100=''
-
-            for x in range(nRows):
-                s100+=f.readline()
-
-            datasetAttributes['hasHeader'], datasetAttributes['header'] = csv.Sniffer().has_header(s100)
-            dialect = csv.Sniffer().sniff(s100)  # Check what kind of csv/tsv file we have.
-            datasetAttributes['delimiter']=dialect.delimiter
-
-            DFI=df.datasetFeatures()._datasetFeatures_a(filepath,dialect,datasetAttributes['hasHeader'],nRows=nRows)
-            if DFI==None:
-                print(f"Failed to detect dataset attributes for dataset '{datasetName}'.")
-                sys.exit()
-
-            DFI_Dict = {
-                "NumberOfColumns": ("Number Of Columns", int(DFI.NumberOfColumns), int(DFI.NumberOfColumns), "The total number of columns/features in the Dataset"),
-                "_name": ("Name", DFI._name, DFI._name, "The name of the dataset"),
-                "AvgOfDistinctValuesPerCol": ("AvgOfDistinctValuesPerCol" ,DFI.AvgOfDistinctValuesPerCol, "{:.1f}%".format(DFI.AvgOfDistinctValuesPerCol*100), "The Average of distinct values per column over the total columns"),
-                "AvgOfDistinctValuesOverAll": ("AvgOfDistinctValuesOverAll", DFI.AvgOfDistinctValuesOverAll, "{:.1f}%".format(DFI.AvgOfDistinctValuesOverAll*100), "The ratio of the number of total unique values to the number of elements"),
-                "AvgOfDistinctValuesPerRow": ("AvgOfDistinctValuesPerRow", DFI.AvgOfDistinctValuesPerRow, "{:.1f}%".format(DFI.AvgOfDistinctValuesPerRow*100), "The Average of distinct values per row over the total rows"),
-                "Top1Value": ("Most Frequent Value", str(DFI.Top1Value), str(DFI.Top1Value), "The most frequent value in the dataset"),
-                "FreqOfTop1FreqValue": ("Top 1 Value %", DFI.FreqOfTop1FreqValue, "{:.1f}%".format(DFI.FreqOfTop1FreqValue*100), "The ratio Of the number of the most frequent value to the number of elements"), 
-                "FreqOfTop2FreqValue": ("Top 2 Value %", DFI.FreqOfTop2FreqValue, "{:.1f}%".format(DFI.FreqOfTop2FreqValue*100), "The ratio of the number of the second most frequent value to the number of elements"), 
-                "FreqOfTop3FreqValue": ("Top 3 Value %", DFI.FreqOfTop3FreqValue, "{:.1f}%".format(DFI.FreqOfTop3FreqValue*100), "The ratio of the number of the third most frequent value to the number of elements"), 
-                "FreqOfIntegerCol": ("Integer Columns %", DFI.FreqOfIntegerCol, "{:.1f}%".format(DFI.FreqOfIntegerCol*100), "The ratio of integer columns to the total number of columns"),
-                "FreqOfNumberCol": ("Number Columns %", DFI.FreqOfNumberCol, "{:.1f}%".format(DFI.FreqOfNumberCol*100), "The ratio of float number columns to the total number of columns"),
-                "FreqOfDateCol": ("Date Columns %", DFI.FreqOfDateCol, "{:.1f}%".format(DFI.FreqOfDateCol*100), "The ratio of date columns to the total number of columns"),
-                "FreqOfStringCol": ("String Columns %", DFI.FreqOfStringCol, "{:.1f}%".format(DFI.FreqOfStringCol*100), "The ratio of columns with text to the total number of columns"),
-                "FreqOfBoolCol": ("Boolean Columns %", DFI.FreqOfBoolCol, "{:.1f}%".format(DFI.FreqOfBoolCol*100), "The ratio of boolean columns to the total number of columns"),
-                "MinItemLen": ("Min Item length", int(DFI.MinItemLen), int(DFI.MinItemLen), "The length of the smallest element in dataset"),
-                "MaxItemLen": ("Max Item Length", int(DFI.MaxItemLen), int(DFI.MaxItemLen), "The length of the largest element in dataset"),
-                "AvgItemLen": ("Avg Item Length", DFI.AvgItemLen, "{:.1f}".format(DFI.AvgItemLen), "The average length of the elements in dataset"),
-                "Freq1CharColumns": ("1-Char Columns %", DFI.Freq1CharColumns, "{:.1f}%".format(DFI.Freq1CharColumns*100), "The columns count with exclusively 1-character elements by the total of columns"),
-                "Freq2ValuesItemColumns": ("2-Value Item Columns %", DFI.Freq2ValuesItemColumns, "{:.1f}%".format(DFI.Freq2ValuesItemColumns*100), "The columns count having exclusively 2 values by the total number of columns"),
-                "HasHeader": ("Has Header?", DFI.HasHeader, DFI.HasHeader, "Does the dataset have Header?"),
-                "delimiter": ("delimiter", DFI.delimiter, DFI.delimiter, "The delimiter between the columns of the dataset"),
-                "type2Words": ("Type 2-INV Words", int(DFI.type2Words), int(DFI.type2Words), "The number of columns containing words used in Type 2-INV datasets. For example (Invoice, Item, Customer etc)")
-            }
-
-            datasetAttributes['datasetFeatures']=DFI_Dict
-
-            # Declare the predicted Dataset type
-            if dialect.datasetType==0:
-              datasetAttributes['datasetTypePredicted']=int(df.datasetFeatures().AutoDetectType(DFI))
-            else:
-               datasetAttributes['datasetTypePredicted']=int(dialect.datasetType)  
+        if sample is None:
+            sample=Global.parseDatasetSample(''.join(lines), sep=dialect.delimiter, hasHeader=datasetAttributes['hasHeader'], nRows=nRows)
+
+        DFI=df.datasetFeatures()._datasetFeatures_a(filepath,dialect,datasetAttributes['hasHeader'],nRows=nRows,sample=sample)
+        if DFI==None:
+            return None
+
+        return datasetAttributes, DFI, int(dialectType)
+
+    def datasetFilepath(self, identity, datasetName, public=0):
+
+        if public==0:
+            return os.path.join('datasets', str(identity), datasetName)
+        return os.path.join('public', datasetName)
+
+    def sniffDataset(self, filepath):
+        #The dialect, header guess and csvMy dataset type of the first nRows lines of a dataset, with the lines read
+        #(or the sample DataFrame of an arff file) for the features
+
+        #The file is read once. Its first lines are sniffed once and parsed to the sample DataFrame of the features
+        if Global.is_arff_file(filepath):
+           #the first rows of an arff file and their lines as csv text. No temp csv is written
+           sample=Global.readDataset(filepath, encoding='utf-8-sig', nRows=nRows)
+           s100=sample.head(nRows-1).to_csv(index=False)
+           lines=None
+        else:
+           #one more line, the header of the nRows rows of the sample
+           lines=Global.readDatasetSample(filepath, nRows+1, encoding='utf-8-sig')
+           s100=''.join(lines[:nRows])
+           sample=None
+
+        # Check what kind of csv/tsv file we have and if it has a header, at once
+        dialect, hasHeader, header, dialectType = csv.Sniffer().sniff_header(s100)
+        return dialect, hasHeader, header, dialectType, lines, sample
+
+    def readDatasetDialect(self, identity, datasetName, public=0):
+        #The delimiter and the has header of a dataset as its metadata file declares them or, without a metadata file,
+        #as the metadata detection sniffs them. Nothing is written and no features or dataset type are detected
+
+        if public==0:
+            metadatapath=os.path.join('output', str(identity), datasetName)
+        else:
+            metadatapath=os.path.join('output', str(identity), 'p', datasetName)
+        metadatapath=os.path.splitext(metadatapath)[0] + '.metadata'
+
+        if os.path.exists(metadatapath):
+            with open(metadatapath, 'r') as file:
+                json_data = json.load(file)
+            if 'delimiter' in json_data and 'hasHeader' in json_data:
+                return json_data['delimiter'], json_data['hasHeader']
+
+        dialect, hasHeader, header, dialectType, lines, sample=self.sniffDataset(self.datasetFilepath(identity, datasetName, public))
+        return dialect.delimiter, hasHeader
+
+    def writeMetadataFile(self, identity, datasetName, datasetType, public, datasetAttributes, DFI, dialectType, datasetTypePredicted):
+
+        DFI_Dict = {
+            "NumberOfColumns": ("Number Of Columns", int(DFI.NumberOfColumns), int(DFI.NumberOfColumns), "The total number of columns/features in the Dataset"),
+            "_name": ("Name", DFI._name, DFI._name, "The name of the dataset"),
+            "AvgOfDistinctValuesPerCol": ("AvgOfDistinctValuesPerCol" ,DFI.AvgOfDistinctValuesPerCol, "{:.1f}%".format(DFI.AvgOfDistinctValuesPerCol*100), "The Average of distinct values per column over the total columns"),
+            "AvgOfDistinctValuesOverAll": ("AvgOfDistinctValuesOverAll", DFI.AvgOfDistinctValuesOverAll, "{:.1f}%".format(DFI.AvgOfDistinctValuesOverAll*100), "The ratio of the number of total unique values to the number of elements"),
+            "AvgOfDistinctValuesPerRow": ("AvgOfDistinctValuesPerRow", DFI.AvgOfDistinctValuesPerRow, "{:.1f}%".format(DFI.AvgOfDistinctValuesPerRow*100), "The Average of distinct values per row over the total rows"),
+            "Top1Value": ("Most Frequent Value", str(DFI.Top1Value), str(DFI.Top1Value), "The most frequent value in the dataset"),
+            "FreqOfTop1FreqValue": ("Top 1 Value %", DFI.FreqOfTop1FreqValue, "{:.1f}%".format(DFI.FreqOfTop1FreqValue*100), "The ratio Of the number of the most frequent value to the number of elements"), 
+            "FreqOfTop2FreqValue": ("Top 2 Value %", DFI.FreqOfTop2FreqValue, "{:.1f}%".format(DFI.FreqOfTop2FreqValue*100), "The ratio of the number of the second most frequent value to the number of elements"), 
+            "FreqOfTop3FreqValue": ("Top 3 Value %", DFI.FreqOfTop3FreqValue, "{:.1f}%".format(DFI.FreqOfTop3FreqValue*100), "The ratio of the number of the third most frequent value to the number of elements"), 
+            "FreqOfIntegerCol": ("Integer Columns %", DFI.FreqOfIntegerCol, "{:.1f}%".format(DFI.FreqOfIntegerCol*100), "The ratio of integer columns to the total number of columns"),
+            "FreqOfNumberCol": ("Number Columns %", DFI.FreqOfNumberCol, "{:.1f}%".format(DFI.FreqOfNumberCol*100), "The ratio of float number columns to the total number of columns"),
+            "FreqOfDateCol": ("Date Columns %", DFI.FreqOfDateCol, "{:.1f}%".format(DFI.FreqOfDateCol*100), "The ratio of date columns to the total number of columns"),
+            "FreqOfStringCol": ("String Columns %", DFI.FreqOfStringCol, "{:.1f}%".format(DFI.FreqOfStringCol*100), "The ratio of columns with text to the total number of columns"),
+            "FreqOfBoolCol": ("Boolean Columns %", DFI.FreqOfBoolCol, "{:.1f}%".format(DFI.FreqOfBoolCol*100), "The ratio of boolean columns to the total number of columns"),
+            "MinItemLen": ("Min Item length", int(DFI.MinItemLen), int(DFI.MinItemLen), "The length of the smallest element in dataset"),
+            "MaxItemLen": ("Max Item Length", int(DFI.MaxItemLen), int(DFI.MaxItemLen), "The length of the largest element in dataset"),
+            "AvgItemLen": ("Avg Item Length", DFI.AvgItemLen, "{:.1f}".format(DFI.AvgItemLen), "The average length of the elements in dataset"),
+            "Freq1CharColumns": ("1-Char Columns %", DFI.Freq1CharColumns, "{:.1f}%".format(DFI.Freq1CharColumns*100), "The columns count with exclusively 1-character elements by the total of columns"),
+            "Freq2ValuesItemColumns": ("2-Value Item Columns %", DFI.Freq2ValuesItemColumns, "{:.1f}%".format(DFI.Freq2ValuesItemColumns*100), "The columns count having exclusively 2 values by the total number of columns"),
+            "HasHeader": ("Has Header?", DFI.HasHeader, DFI.HasHeader, "Does the dataset have Header?"),
+            "delimiter": ("delimiter", DFI.delimiter, DFI.delimiter, "The delimiter between the columns of the dataset"),
+            "type2Words": ("Type 2-INV Words", int(DFI.type2Words), int(DFI.type2Words), "The number of columns containing words used in Type 2-INV datasets. For example (Invoice, Item, Customer etc)")
+        }
+
+        datasetAttributes['datasetFeatures']=DFI_Dict
+
+        # The per column timing report of the classification of the columns: column > [type, seconds]
+        datasetAttributes['columnTypes']={str(name): [colType, round(seconds, 6)] for name, (colType, seconds) in DFI.ColumnTypes.items()}
 
-            if datasetType==-1:
-                if dialect.datasetType==1: #Without Machine learning detection
-                    datasetAttributes['datasetType']=int(dialect.datasetType)
+        datasetAttributes['datasetTypePredicted']=datasetTypePredicted
+
+        if datasetType==-1:
+            if dialectType==1: #Without Machine learning detection
+                datasetAttributes['datasetType']=int(dialectType)
+            else:
+                if DFI.datasetType==-1:
+                    datasetAttributes['datasetType']=datasetAttributes['datasetTypePredicted']
                 else:
-                    if DFI.datasetType==-1:
-                        datasetAttributes['datasetType']=datasetAttributes['datasetTypePredicted']
-                    else:
-                        datasetAttributes['datasetType']=int(DFI.datasetType)
-            else: 
-                datasetAttributes['datasetType']=int(datasetType)
+                    datasetAttributes['datasetType']=int(DFI.datasetType)
+        else: 
+            datasetAttributes['datasetType']=int(datasetType)
 
         if datasetAttributes['datasetType']==3:
             datasetAttributes['absentValue']=str(DFI.Top1Value)
@@ -139,3 +242,41 @@ class Metadata():
 
         # Now you can work with the JSON data as a Python dictionary or list
         return json_data
+
+    def readDatasetRecords(self, identity, datasetName, public=0):
+        #The records (lines) count of the dataset. It is kept in the metadata file while the dataset file is unchanged
+
+        if public==0:
+            filepath=os.path.join('datasets', str(identity), datasetName)
+            metadatapath=os.path.join('output', str(identity), datasetName)
+        else:
+            filepath=os.path.join('public', datasetName)
+            metadatapath=os.path.join('output', str(identity), 'p', datasetName)
+        metadatapath=os.path.splitext(metadatapath)[0] + '.metadata'
+
+        json_data=self.readMetadataFile(identity,datasetName,public)
+
+        stat=os.stat(filepath)
+        records=json_data.get('records')
+        if isinstance(records, dict) and records.get('mtime')==stat.st_mtime_ns and records.get('size')==stat.st_size:
+            return records['count']
+
+        records={'count': Global.countDatasetRecords(filepath), 'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+
+        # Only the records key is set on the metadata file as it is now, so the parameters saved while counting
+        # are kept. Written to a temp file of its own and renamed, so a concurrent request never reads half a
+        # file and two requests don't write the same temp file
+        with open(metadatapath, 'r') as file:
+            json_data = json.load(file)
+        json_data['records']=records
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(metadatapath), suffix='.tmp', delete=False) as file:
+            tempFilepath=file.name
+        try:
+            with open(tempFilepath, 'w') as file:
+                json.dump(json_data, file, indent=4)
+            os.replace(tempFilepath, metadatapath)
+        except Exception:
+            os.remove(tempFilepath)
+            raise
+
+        return records['count']
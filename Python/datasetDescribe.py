@@ -61,7 +61,7 @@ try:
         print(f"An error occurred: Could not read dataset!")     
         sys.exit    
 
-    DR=Global.countDatasetRecords(filepath)
+    DR=metadataInst.readDatasetRecords(identity,datasetName,public)
 
     datasetDescription['features']={"Rows":  ("Dataset rows", DR, DR, "The total rows of the dataset")}
 
@@ -0,0 +1,66 @@
+"""
+datasetMetadataBatch.py - creates the metadata files of all the datasets of a
+directory at once (see Metadata.createMetadataFiles). The features are extracted
+in a process pool, the types predicted with one predict call and the throughput
+is reported.
+Usage: python datasetMetadataBatch.py identity [public] [processes]
+"""
+
+import sys
+import os
+import json
+from time import time
+import datasetAttrAutoDetectMetadata as Metadata
+
+#------------------------------
+#command line arguments section
+#------------------------------
+
+#identity
+identity='111111111' #random for testing purposes
+if len(sys.argv)>1:
+	try:
+		identity=str(sys.argv[1])
+	except:
+		sys.exit()
+
+public=1 # 0 > private, 1 > public
+if len(sys.argv)>2:
+    if len(sys.argv[2])>0:
+        public=int(sys.argv[2])
+
+processes=None # None > the cpu count
+if len(sys.argv)>3:
+    if len(sys.argv[3])>0:
+        processes=int(sys.argv[3])
+
+#------------------------------
+#end command line arguments section
+#------------------------------
+
+if __name__=='__main__':
+    try:
+
+        if public==0:
+            folderpath=os.path.join('datasets', str(identity))
+        else:
+            folderpath='public'
+
+        #the dataset files, not the hidden column stores
+        datasetNames=sorted(x for x in os.listdir(folderpath) if not x.startswith('.') and os.path.isfile(os.path.join(folderpath, x)))
+
+        startTime=time()
+        results=Metadata.Metadata().createMetadataFiles(identity, datasetNames, -1, public, processes)
+        seconds=time()-startTime
+
+        failed={x: results[x] for x in datasetNames if not isinstance(results[x], dict)}
+        print(json.dumps({
+            'datasets': len(datasetNames),
+            'created': len(datasetNames)-len(failed),
+            'failed': failed,
+            'seconds': round(seconds, 3),
+            'datasetsPerSecond': round(len(datasetNames)/max(seconds, 1e-6), 2)
+        }, indent=4, ensure_ascii=False))
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,53 @@
+"""
+datasetStore.py - writes the memory mapped column store of an uploaded dataset
+(see Global.writeColumnStore), so the later readDataset calls of the dataset
+skip the text parsing. The delimiter and the header are sniffed as the metadata
+detection does, the metadata file itself is left to datasetAttrAutoDetect.
+Usage: python datasetStore.py identity datasetName [public]
+"""
+
+import sys
+import json
+import datasetAttrAutoDetectMetadata as Metadata
+import Global
+
+#------------------------------
+#command line arguments section
+#------------------------------
+
+#identity
+identity='111111111' #random for testing purposes
+if len(sys.argv)>1:
+	try:
+		identity=str(sys.argv[1])
+	except:
+		sys.exit()
+
+datasetName='something.csv'
+if len(sys.argv)>2:
+    if len(sys.argv[2])>0:
+        datasetName=sys.argv[2]
+
+public=0 # 0 > private, 1 > public
+if len(sys.argv)>3:
+    if len(sys.argv[3])>0:
+        public=int(sys.argv[3])
+
+#------------------------------
+#end command line arguments section
+#------------------------------
+
+try:
+
+    metadataInst=Metadata.Metadata()
+    filepath=metadataInst.datasetFilepath(identity, datasetName, public)
+
+    #the delimiter and the header the metadata detection finds, without running it (no features, no model)
+    delimiter, hasHeader=metadataInst.readDatasetDialect(identity, datasetName, public)
+
+    manifest=Global.writeColumnStore(filepath, sep=delimiter, encoding='utf-8-sig', hasHeader=hasHeader)
+
+    print(json.dumps({'rows': manifest['rows'], 'columns': len(manifest['columns'])}))
+
+except Exception as e:
+    print(f"An error occurred: {e}")
@@ -7,14 +7,232 @@ Owner: Malliaridis Konstantinos PHd candidate
 import os
 import sys
 import pandas as pd
+import numpy as np
 from joblib import load
 import Global
 import math
+import time
 from itertools import islice
 
 missingValuesThreshold=0.2
 nRows=500
 
+def datasetItemLengths(df):
+    # The DataFrame of the lengths of the items (as strings, 0 for None) of the dataset.
+    # The items are taken once as a single object array instead of a df.map per feature
+    values=df.to_numpy(dtype=object)
+    lengths=np.fromiter((len(str(x)) if x is not None else 0 for x in values.ravel()), dtype=np.int64, count=values.size)
+    return pd.DataFrame(lengths.reshape(values.shape), index=df.index, columns=df.columns)
+
+def distinctValuesPerRow(df):
+    # The NumPy array of the distinct values count (missing values excluded, as nunique does) of every row.
+    # All the items are factorized together and the sorted codes of each row are counted where they change
+    codes, _ = pd.factorize(df.to_numpy(dtype=object).ravel())
+    codes=np.sort(codes.reshape(df.shape), axis=1)
+    if df.shape[1]==0:
+        return np.zeros(df.shape[0], dtype=np.int64)
+    distinct=(codes[:, 1:]!=codes[:, :-1]).sum(axis=1)+1
+    #the missing values have the smallest code -1
+    return distinct-(codes[:, 0]==-1)
+
+#The value pairs of a bool column
+boolValues=[[0, 1], ['t', 'f'], ['T', 'F'], ['y', 'n'], ['Y', 'N'], ['YES', 'NO'], ['yes', 'no'], ['Yes', 'No'],
+            ['true', 'false'], ['TRUE', 'FALSE'], ['True', 'False'], [True, False]]
+
+def columnType(dfcol, uniqueValues=None):
+    # The type 'bool', 'integer', 'numeric', 'date' or 'string' of a column without missing values.
+    # The checks run in order (bool values, number, number with comma as decimal separator e.g. like greek
+    # regional settings, date) on the distinct values of the column, so a long column of a few values is
+    # checked once per value. A column of more than 2 distinct values can't be bool
+    if uniqueValues is None:
+        uniqueValues=dfcol.nunique()
+    values=dfcol.drop_duplicates()
+
+    if uniqueValues<=2 and any(values.isin(pair).all() for pair in boolValues):
+        return 'bool'
+
+    try:
+        pd.to_numeric(values, errors='raise')
+        dfint=dfcol.astype('int64')
+        return 'integer' if dfint.sum()==dfcol.sum() else 'numeric'
+    except ValueError:
+        pass
+
+    try:
+        pd.to_numeric(values.str.replace('.', '').str.replace(',', '.'), errors='raise')
+        dfc=dfcol.str.replace('.', '') # 43.700,00 --> 43700,00
+        dfc=dfc.str.replace(',', '.')      # 43700,00  --> 43700.00
+        dfc=pd.to_numeric(dfc, errors='raise')
+        dfint=dfc.astype('int64')
+        return 'integer' if dfint.sum()==dfc.sum() else 'numeric'
+    except ValueError:
+        pass
+
+    try:
+        # to_datetime ensures that it will find that a column is datetime even if it has
+        # other format than the expected (expected format yyy-mm-dd)
+        pd.to_datetime(values, errors='raise', format='mixed')
+        return 'date'
+    except ValueError:
+        # Ok it is not a datetime Column. So what!!!
+        return 'string'
+
+#The checks of a text column after the bool one, in order. Each raises ValueError if a value of values fails
+def numberValues(values):
+    return pd.to_numeric(values, errors='raise')
+
+def commaNumberValues(values):
+    return pd.to_numeric(values.str.replace('.', '').str.replace(',', '.'), errors='raise')
+
+def dateValues(values):
+    return pd.to_datetime(values, errors='raise', format='mixed')
+
+def textValues(dfcol):
+    # True if the values of an object column (e.g. read by pandas < 3) are all text or missing, as the ones of a
+    # string column are
+    return all(isinstance(x, str) for x in dfcol.dropna().tolist())
+
+def columnTypes(df):
+    # The lists of the types (see columnType) and of the classification seconds of all the columns of the dataset.
+    # The integer and bool columns are classified by their dtype and distinct values and the text columns (string
+    # dtype or object dtype of text values) by their first value. The checks of a text column fail at its first value
+    # if it fails (mostly on every column of a wide 3-SI dataset, with the result of the value cached for all the
+    # columns). Only if the first value passes a check the whole column is checked by columnType, as the other
+    # columns are
+    types=[None]*df.shape[1]
+    seconds=[0.0]*df.shape[1]
+    boolSets=[set(pair) for pair in boolValues]
+    passed={}
+    for j in range(df.shape[1]):
+        startTime=time.perf_counter()
+        dfcol=df.iloc[:, j]
+        dtype=dfcol.dtype
+
+        if isinstance(dtype, np.dtype) and dtype.kind=='b':
+            types[j]='bool'
+
+        elif isinstance(dtype, np.dtype) and dtype.kind in 'iu':
+            types[j]='bool' if set(np.unique(dfcol.to_numpy()).tolist())<={0, 1} else 'integer'
+
+        elif isinstance(dtype, pd.StringDtype) or (dtype.kind=='O' and textValues(dfcol)):
+            #up to 3 distinct values in order of appearance, the missing values dropped
+            values={}
+            for x in dfcol.tolist():
+                if isinstance(x, str):
+                    values[x]=None
+                    if len(values)>2:
+                        break
+            if len(values)==0:
+                types[j]=columnType(dfcol.dropna())
+            elif len(values)<=2 and any(all(x in pair for x in values) for pair in boolSets):
+                types[j]='bool'
+            else:
+                first=next(iter(values))
+                types[j]='string'
+                for check in (numberValues, commaNumberValues, dateValues):
+                    if (check, first) not in passed:
+                        try:
+                            check(pd.Series([first], dtype=dtype))
+                            passed[(check, first)]=True
+                        except ValueError:
+                            passed[(check, first)]=False
+                    if passed[(check, first)]:
+                        types[j]=columnType(dfcol.dropna())
+                        break
+
+        else:
+            types[j]=columnType(dfcol.dropna())
+
+        seconds[j]=time.perf_counter()-startTime
+
+    return types, seconds
+
+# The trained models of AutoDetectType, loaded once per process and reloaded when their file changes.
+# {filepath: (mtime, size, model)}
+trainedModels={}
+
+class flatForest:
+    """The trees of a trained RandomForestClassifier flattened to NumPy arrays
+    (see exportTrainedModel). Predicts as the forest does without unpickling sklearn.
+
+    """
+    def __init__(self, filepath):
+        with np.load(filepath, allow_pickle=False) as arrays:
+            self.featureNames=list(arrays['featureNames'])
+            self.classes=arrays['classes']
+            self.roots=arrays['roots']
+            self.left=arrays['left']
+            self.right=arrays['right']
+            self.feature=arrays['feature']
+            self.threshold=arrays['threshold']
+            self.missingLeft=arrays['missingLeft']
+            self.value=arrays['value']
+
+    def predict(self, X):
+        #The features are float32 as in sklearn. All the trees walk one level per step
+        X=X[self.featureNames].to_numpy(dtype=np.float32)
+        y=[]
+        for x in X:
+            nodes=self.roots.copy()
+            inner=self.left[nodes]!=-1
+            while inner.any():
+                n=nodes[inner]
+                values=x[self.feature[n]]
+                goLeft=(values<=self.threshold[n]) | (np.isnan(values) & self.missingLeft[n])
+                nodes[inner]=np.where(goLeft, self.left[n], self.right[n])
+                inner=self.left[nodes]!=-1
+            y.append(self.classes[np.argmax(self.value[nodes].sum(axis=0))])
+        return np.array(y)
+
+def exportTrainedModel(model, filepath):
+    #Writes the trees of a RandomForestClassifier to a .npz file of flattened arrays, read by flatForest.
+    #The node indices of every tree are shifted by the nodes of the trees before it
+    roots, left, right, feature, threshold, missingLeft, value=[], [], [], [], [], [], []
+    offset=0
+    for estimator in model.estimators_:
+        tree=estimator.tree_
+        roots.append(offset)
+        left.append(np.where(tree.children_left==-1, -1, tree.children_left+offset))
+        right.append(np.where(tree.children_right==-1, -1, tree.children_right+offset))
+        feature.append(tree.feature)
+        threshold.append(tree.threshold)
+        missingLeft.append(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8)))
+        #the class fractions of every node, as predict_proba of the tree
+        nodeValue=tree.value[:, 0, :]
+        value.append(nodeValue/nodeValue.sum(axis=1, keepdims=True))
+        offset+=tree.node_count
+
+    np.savez(filepath,
+             featureNames=np.array(model.feature_names_in_, dtype=str),
+             classes=model.classes_,
+             roots=np.array(roots, dtype=np.intp),
+             left=np.concatenate(left).astype(np.intp),
+             right=np.concatenate(right).astype(np.intp),
+             feature=np.concatenate(feature).astype(np.intp),
+             threshold=np.concatenate(threshold),
+             missingLeft=np.concatenate(missingLeft).astype(bool),
+             value=np.concatenate(value))
+
+def loadTrainedModel(filepath=os.path.join('features','TrainedModel.joblib')):
+    #The trained model, from the cache of the process while its file is unchanged.
+    #The flattened export (.npz) is preferred when it is not older than the model file
+    compactpath=os.path.splitext(filepath)[0] + '.npz'
+    stat=os.stat(filepath)
+    if os.path.exists(compactpath) and os.stat(compactpath).st_mtime_ns>=stat.st_mtime_ns:
+        filepath=compactpath
+        stat=os.stat(filepath)
+
+    cached=trainedModels.get(filepath)
+    if cached is not None and cached[0]==stat.st_mtime_ns and cached[1]==stat.st_size:
+        return cached[2]
+
+    if filepath==compactpath:
+        model=flatForest(filepath)
+    else:
+        model=load(filepath)
+    trainedModels[filepath]=(stat.st_mtime_ns, stat.st_size, model)
+    return model
+
 class datasetFeatures:
     """Creates the features of a given dataset or dataset sample that can be used 
     in Machine learning experiments
@@ -47,17 +265,25 @@ class datasetFeatures:
     #This is not an attribute directly at least.
     datasetType=-1
 
-    def _datasetFeatures_a(self, filepath, dialect, hasHeader, nRows=500):
+    #Not a feature. The (type, seconds) of the classification of every column, the per column timing report
+    #written to the metadata file as columnTypes
+    ColumnTypes={}
+
+    def _datasetFeatures_a(self, filepath, dialect, hasHeader, nRows=500, sample=None):
         # Creates the features of the dataset in order to determine datasetType via ML
+        # sample is the already parsed DataFrame of the first nRows rows of the dataset, if any
         try:
 
-            df=Global.readDataset(filepath, sep=dialect.delimiter, encoding='utf-8-sig', hasHeader=hasHeader, nRows=nRows)
+            df=sample
+            if not isinstance(df, pd.DataFrame):
+                df=Global.readDataset(filepath, sep=dialect.delimiter, encoding='utf-8-sig', hasHeader=hasHeader, nRows=nRows)
             if not isinstance(df, pd.DataFrame):
                 print(f"An error occurred: Could not read dataset!")     
                 sys.exit    
             
             class datasetFeaturesInst(datasetFeatures):
                 _name=os.path.basename(filepath)
+                ColumnTypes={}
 
             # We want to find and keep the most frequent value because with df=df.fillna(0) later the value may change to 0 for ever!!!
             # Concatenate all columns into a single Series in order to avoid iterating in all columns of the dataframe...
@@ -118,7 +344,9 @@ class datasetFeatures:
             integerColumns=0
             datetimeColumns=0
             twoValuesItemColumn=0
-            for myCol in df.columns:
+            #classify the columns (missing values are eliminated...)
+            colTypes, colSeconds = columnTypes(df)
+            for j, myCol in enumerate(df.columns):
 
                 #Remove the rows from current column that have missing values
 
@@ -136,60 +364,16 @@ class datasetFeatures:
                 if uniqueValues<=2:
                     twoValuesItemColumn+=1
 
-                #detect bool column values (missing values have been eliminated in this stage...)
-                if (dfcol.isin([0, 1]).all() or 
-                    dfcol.isin(['t', 'f']).all() or
-                    dfcol.isin(['T', 'F']).all() or
-                    dfcol.isin(['y', 'n']).all() or
-                    dfcol.isin(['Y', 'N']).all() or
-                    dfcol.isin(['YES', 'NO']).all() or
-                    dfcol.isin(['yes', 'no']).all() or
-                    dfcol.isin(['Yes', 'No']).all() or                    
-                    dfcol.isin(['true', 'false']).all() or
-                    dfcol.isin(['TRUE', 'FALSE']).all() or
-                    dfcol.isin(['True', 'False']).all() or                    
-                    dfcol.isin([True, False]).all()
-                   ):
-                        boolColumns+=1
-                        continue
-                
-                try:
-                    # At first check if you can recognise the column as number
-                    tempColumn = pd.to_numeric(dfcol, errors='raise')
-                    dfint=dfcol.astype('int64') 
-                    if dfint.sum()==dfcol.sum():
-                        integerColumns+=1
-                        continue
-                    else:  
-                        numericColumns+=1
-                        continue
-
-                except ValueError:
-                    try:
-                        # If not then try to check if it is a number but with comma as delimiter e.g. like greek regional settings
-                        dfc=dfcol.str.replace('.', '') # 43.700,00 --> 43700,00
-                        dfc=dfc.str.replace(',', '.')      # 43700,00  --> 43700.00
-                        dfc=pd.to_numeric(dfc, errors='raise') #check if can be pasred as number
-                        dfint=dfc.astype('int64') 
-                        if dfint.sum()==dfc.sum():
-                            integerColumns+=1
-                            continue
-                        else:  
-                            numericColumns+=1
-                            continue
-                          
-                    except ValueError:
-                        try:
-                            # If not a number the try to check if it is a date.
-                            # to_datetime ensures that it will find that a column is datetime even if it has 
-                            # other format than the expected (expected format yyy-mm-dd)
-                            tempColumn = pd.to_datetime(dfcol, errors='raise', format='mixed')
-                            datetimeColumns+=1
-                            continue
-                        except ValueError:
-                            # Ok it is not a datetime Column. So what!!!
-                            datetimeColumns+=0
-                            continue
+                colType=colTypes[j]
+                datasetFeaturesInst.ColumnTypes[myCol]=(colType, colSeconds[j])
+                if colType=='bool':
+                    boolColumns+=1
+                elif colType=='integer':
+                    integerColumns+=1
+                elif colType=='numeric':
+                    numericColumns+=1
+                elif colType=='date':
+                    datetimeColumns+=1
 
             datasetFeaturesInst.AvgOfDistinctValuesPerCol=freqplus/df.shape[1] #df.shape[1]->#Columns
 
@@ -219,8 +403,8 @@ class datasetFeatures:
                     datasetFeaturesInst.FreqOfTop3FreqValue=si/(df.shape[0]*df.shape[1])
         
             freq=0
-            for i in range(df.shape[0]):
-                freq+=df.iloc[i].nunique()/df.shape[1] #df.shape[0]->#rows
+            for rowFreq in (distinctValuesPerRow(df)/df.shape[1]).tolist():
+                freq+=rowFreq #df.shape[0]->#rows
             datasetFeaturesInst.AvgOfDistinctValuesPerRow=freq/df.shape[0] #df.shape[1]->#Columns
 
             datasetFeaturesInst.NumberOfColumns=df.shape[1]
@@ -230,12 +414,14 @@ class datasetFeatures:
             #All the other columns are of String/Object type 
             datasetFeaturesInst.FreqOfStringCol = round(1-datasetFeaturesInst.FreqOfIntegerCol-datasetFeaturesInst.FreqOfNumberCol-datasetFeaturesInst.FreqOfBoolCol-datasetFeaturesInst.FreqOfDateCol,6)
 
-            datasetFeaturesInst.MinItemLen = (df.map(lambda x: len(str(x)) if x is not None else 0).min()).min()
-            datasetFeaturesInst.MaxItemLen = (df.map(lambda x: len(str(x)) if x is not None else 0).max()).max()
-            datasetFeaturesInst.AvgItemLen = (df.map(lambda x: len(str(x)) if x is not None else 0).mean()).mean()
+            # The lengths of the items are computed once for all the length features
+            itemLengths = datasetItemLengths(df)
+            datasetFeaturesInst.MinItemLen = (itemLengths.min()).min()
+            datasetFeaturesInst.MaxItemLen = (itemLengths.max()).max()
+            datasetFeaturesInst.AvgItemLen = (itemLengths.mean()).mean()
 
             # Count columns with only 1-character items
-            datasetFeaturesInst.Freq1CharColumns = (df.map(lambda x: len(str(x)) == 1 if x is not None else False).all()).sum()/df.shape[1]
+            datasetFeaturesInst.Freq1CharColumns = ((itemLengths == 1).all()).sum()/df.shape[1]
 
             datasetFeaturesInst.HasHeader=hasHeader
 
@@ -248,34 +434,38 @@ class datasetFeatures:
         
     def AutoDetectType(self, dFI):
 
+        return(self.AutoDetectTypes([dFI])[0])
+
+    def AutoDetectTypes(self, dFIs):
+        #The types of many datasets, one row of features per dataset and one predict call
+
         #_name, datasetType. Top1Value omitted intetionally. _name irrelevant, datasetType > Y (predicted datasetType)
         data = {
-                'AvgOfDistinctValuesPerCol': [dFI.AvgOfDistinctValuesPerCol],
-                'AvgOfDistinctValuesOverAll': [dFI.AvgOfDistinctValuesOverAll],
-                'AvgOfDistinctValuesPerRow': [dFI.AvgOfDistinctValuesPerRow],
-                'FreqOfTop1FreqValue': [dFI.FreqOfTop1FreqValue],
-                'FreqOfTop2FreqValue': [dFI.FreqOfTop2FreqValue],  
-                'FreqOfTop3FreqValue': [dFI.FreqOfTop3FreqValue],
-                'NumberOfColumns': [dFI.NumberOfColumns],
-                'FreqOfIntegerCol': [dFI.FreqOfIntegerCol],
-                'FreqOfNumberCol': [dFI.FreqOfNumberCol],
-                'FreqOfDateCol': [dFI.FreqOfDateCol],
-                'FreqOfStringCol': [dFI.FreqOfStringCol],
-                'FreqOfBoolCol': [dFI.FreqOfBoolCol],
-                'MinItemLen': [dFI.MinItemLen.item()],  
-                'MaxItemLen': [dFI.MaxItemLen.item()],
-                'AvgItemLen': [dFI.AvgItemLen],
-                'Freq1CharColumns': [dFI.Freq1CharColumns],
-                'Freq2ValuesItemColumns': [dFI.Freq2ValuesItemColumns],
-                'hasHeader': [dFI.HasHeader],       
-                'type2Words': [dFI.type2Words]
-        }                                                              
+                'AvgOfDistinctValuesPerCol': [x.AvgOfDistinctValuesPerCol for x in dFIs],
+                'AvgOfDistinctValuesOverAll': [x.AvgOfDistinctValuesOverAll for x in dFIs],
+                'AvgOfDistinctValuesPerRow': [x.AvgOfDistinctValuesPerRow for x in dFIs],
+                'FreqOfTop1FreqValue': [x.FreqOfTop1FreqValue for x in dFIs],
+                'FreqOfTop2FreqValue': [x.FreqOfTop2FreqValue for x in dFIs],
+                'FreqOfTop3FreqValue': [x.FreqOfTop3FreqValue for x in dFIs],
+                'NumberOfColumns': [x.NumberOfColumns for x in dFIs],
+                'FreqOfIntegerCol': [x.FreqOfIntegerCol for x in dFIs],
+                'FreqOfNumberCol': [x.FreqOfNumberCol for x in dFIs],
+                'FreqOfDateCol': [x.FreqOfDateCol for x in dFIs],
+                'FreqOfStringCol': [x.FreqOfStringCol for x in dFIs],
+                'FreqOfBoolCol': [x.FreqOfBoolCol for x in dFIs],
+                'MinItemLen': [x.MinItemLen.item() for x in dFIs],
+                'MaxItemLen': [x.MaxItemLen.item() for x in dFIs],
+                'AvgItemLen': [x.AvgItemLen for x in dFIs],
+                'Freq1CharColumns': [x.Freq1CharColumns for x in dFIs],
+                'Freq2ValuesItemColumns': [x.Freq2ValuesItemColumns for x in dFIs],
+                'hasHeader': [x.HasHeader for x in dFIs],
+                'type2Words': [x.type2Words for x in dFIs]
+        }
         X_Pred = pd.DataFrame(data)
 
-        #Load the trained model
-        filepath=os.path.join('features','TrainedModel.joblib')
-        rf_model = load(filepath)
+        #The trained model, loaded once per process
+        rf_model = loadTrainedModel()
 
         y_pred = rf_model.predict(X_Pred)
 
-        return(y_pred[0])
+        return(y_pred)
@@ -0,0 +1,284 @@
+"""
+miningService.py - the resident association rules mining service. Its worker processes
+import pandas, numpy, scipy and Main05 once and keep the trained model of the dataset type
+detection loaded (the transactions caches are the npz files next to the metadata files).
+The requests of retrieveRules.php are queued as jobs and run by the workers
+(Main05.retrieve_rules), instead of a new python process per request. A job running longer
+than its time limit, or cancelled, has its worker killed and started again.
+Usage: python miningService.py [port] [processes] [host] [timeLimit]
+    POST   /jobs      identity, datasetName, public, timeLimit (form or json) > {"job", "status"}
+    GET    /jobs/job  > {"job", "status": queued, running, done, error or cancelled, "output": the Main05.py output}
+    DELETE /jobs/job  > cancels a queued or running job
+    GET    /status    > the workers and the jobs count by status
+"""
+
+import sys
+import os
+import io
+import json
+import uuid
+import queue
+import signal
+import threading
+import contextlib
+import multiprocessing
+from time import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+import Main05
+import datasetTypeDetection as df
+
+#------------------------------
+#command line arguments section
+#------------------------------
+
+port=8765
+if len(sys.argv)>1:
+    if len(sys.argv[1])>0:
+        port=int(sys.argv[1])
+
+processes=2 # worker processes, the jobs run at the same time
+if len(sys.argv)>2:
+    if len(sys.argv[2])>0:
+        processes=int(sys.argv[2])
+
+host='127.0.0.1' # local only, the php pages are the clients
+if len(sys.argv)>3:
+    if len(sys.argv[3])>0:
+        host=sys.argv[3]
+
+job_time_limit=1800 # seconds a job may run, a job may ask for less
+if len(sys.argv)>4:
+    if len(sys.argv[4])>0:
+        job_time_limit=float(sys.argv[4])
+
+#------------------------------
+#end command line arguments section
+#------------------------------
+
+# queued and running jobs from which a new job is refused (http 503)
+max_jobs=100
+# seconds a finished job is kept for polling
+job_keep_seconds=3600
+# seconds between the checks of the time limit and the cancellation of a running job
+job_check_seconds=0.5
+
+def start_worker(folder):
+    # every worker runs in the Python folder, as Main05.py does when called by php
+    os.chdir(folder)
+
+def warm_worker():
+    # the first job of a worker doesn't load the trained model of the dataset type detection
+    try:
+        df.loadTrainedModel()
+    except Exception:
+        pass
+    return os.getpid()
+
+def run_job(identity, datasetName, public):
+    """
+    Runs Main05.retrieve_rules in a worker and returns what it prints, the output php expects from Main05.py.
+    """
+    output=io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            Main05.retrieve_rules(identity, datasetName, public)
+        except SystemExit:
+            # the functions of Main05 and Metadata end on errors with sys.exit after printing them
+            pass
+        except Exception as e:
+            print(f"An error occurred: {e}")
+    return output.getvalue()
+
+class MiningService:
+    """The job queue of the service and its workers. Every worker is a process of its own
+    executor, run by a thread that takes the queued jobs one at a time, so a worker is
+    killed and started again without stopping the jobs of the other workers.
+
+    """
+    def __init__(self, processes):
+        self.processes=processes
+        self.jobs={}
+        self.lock=threading.Lock()
+        self.queue=queue.Queue()
+        for x in range(processes):
+            threading.Thread(target=self.run_worker, args=(self.create_executor(),), daemon=True).start()
+
+    def create_executor(self):
+        # a spawned worker, the server threads are not forked. Returns (executor, pid of its worker)
+        executor=ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=start_worker, initargs=(os.path.dirname(os.path.abspath(__file__)),))
+        return executor, executor.submit(warm_worker).result()
+
+    def kill_executor(self, executor, pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def finish(self, job, status, output):
+        with self.lock:
+            job['status']=status
+            job['output']=output
+            job['finished']=time()
+
+    def run_worker(self, worker):
+        executor, pid=worker
+        while True:
+            jobId=self.queue.get()
+            with self.lock:
+                job=self.jobs.get(jobId)
+                if job is None or job['status']!='queued':
+                    continue
+                job['status']='running'
+                job['started']=time()
+
+            try:
+                future=executor.submit(run_job, job['identity'], job['datasetName'], job['public'])
+                while True:
+                    try:
+                        self.finish(job, 'done', future.result(timeout=job_check_seconds))
+                        break
+                    except TimeoutError:
+                        if job['cancel'] or time()-job['started']>job['timeLimit']:
+                            # the job can't be stopped inside the worker, the worker is
+                            self.kill_executor(executor, pid)
+                            if job['cancel']:
+                                self.finish(job, 'cancelled', "An error occurred: The mining job was cancelled")
+                            else:
+                                self.finish(job, 'error', f"An error occurred: The mining job did not end in {job['timeLimit']:g} seconds")
+                            executor, pid=self.create_executor()
+                            break
+            except BrokenProcessPool:
+                # the worker died (e.g. out of memory), it is started again
+                self.finish(job, 'error', "An error occurred: The mining worker stopped")
+                self.kill_executor(executor, pid)
+                executor, pid=self.create_executor()
+            except Exception as e:
+                self.finish(job, 'error', f"An error occurred: {e}")
+
+    def submit(self, identity, datasetName, public, timeLimit=None):
+        with self.lock:
+            # the finished jobs not polled for long are dropped
+            now=time()
+            for jobId in [x for x, y in self.jobs.items() if 'finished' in y and now-y['finished']>job_keep_seconds]:
+                del self.jobs[jobId]
+
+            if sum(1 for x in self.jobs.values() if x['status'] in ('queued', 'running'))>=max_jobs:
+                return None
+
+            jobId=uuid.uuid4().hex
+            self.jobs[jobId]={'identity': identity, 'datasetName': datasetName, 'public': public, 'submitted': now,
+                              'timeLimit': job_time_limit if timeLimit is None else min(timeLimit, job_time_limit),
+                              'status': 'queued', 'cancel': False}
+        self.queue.put(jobId)
+        return jobId
+
+    def cancel(self, jobId):
+        with self.lock:
+            job=self.jobs.get(jobId)
+            if job is None:
+                return None
+            if job['status']=='queued':
+                # dropped by the worker that takes it from the queue
+                job['status']='cancelled'
+                job['output']="An error occurred: The mining job was cancelled"
+                job['finished']=time()
+            elif job['status']=='running':
+                # its worker kills it within job_check_seconds
+                job['cancel']=True
+            return {'job': jobId, 'status': job['status']}
+
+    def result(self, jobId):
+        with self.lock:
+            job=self.jobs.get(jobId)
+            if job is None:
+                return None
+            result={'job': jobId, 'status': job['status'], 'seconds': round(time()-job['submitted'], 3)}
+            if 'output' in job:
+                result['output']=job['output']
+        return result
+
+    def status(self):
+        with self.lock:
+            statuses=[x['status'] for x in self.jobs.values()]
+        return {'processes': self.processes, 'timeLimit': job_time_limit,
+                'jobs': {x: statuses.count(x) for x in ('queued', 'running', 'done', 'error', 'cancelled')}}
+
+class MiningServiceHandler(BaseHTTPRequestHandler):
+
+    def send_json(self, code, data):
+        body=json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip('/')!='/jobs':
+            self.send_json(404, {'error': 'Unknown path'})
+            return
+
+        body=self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        try:
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                params=json.loads(body)
+            else:
+                params={x: y[0] for x, y in parse_qs(body, keep_blank_values=True).items()}
+            identity=str(params['identity'])
+            datasetName=str(params['datasetName'])
+            public=int(params.get('public', 0))
+            timeLimit=float(params['timeLimit']) if params.get('timeLimit', '')!='' else None
+        except (ValueError, KeyError) as e:
+            self.send_json(400, {'error': f"Invalid job parameters: {e}"})
+            return
+
+        # a user folder and a file of it, not a path
+        if not identity.isalnum() or len(datasetName)==0 or os.path.basename(datasetName)!=datasetName:
+            self.send_json(400, {'error': 'Invalid identity or dataset name'})
+            return
+
+        jobId=self.server.service.submit(identity, datasetName, public, timeLimit)
+        if jobId is None:
+            self.send_json(503, {'error': 'Too many jobs, please try again later'})
+            return
+        self.send_json(202, {'job': jobId, 'status': 'queued'})
+
+    def do_GET(self):
+        path=self.path.rstrip('/')
+        if path=='/status':
+            self.send_json(200, self.server.service.status())
+        elif path.startswith('/jobs/'):
+            result=self.server.service.result(path[len('/jobs/'):])
+            if result is None:
+                self.send_json(404, {'error': 'Unknown job'})
+            else:
+                self.send_json(200, result)
+        else:
+            self.send_json(404, {'error': 'Unknown path'})
+
+    def do_DELETE(self):
+        path=self.path.rstrip('/')
+        if not path.startswith('/jobs/'):
+            self.send_json(404, {'error': 'Unknown path'})
+            return
+        result=self.server.service.cancel(path[len('/jobs/'):])
+        if result is None:
+            self.send_json(404, {'error': 'Unknown job'})
+        else:
+            self.send_json(200, result)
+
+if __name__=='__main__':
+    try:
+        server=ThreadingHTTPServer((host, port), MiningServiceHandler)
+        server.service=MiningService(processes)
+        print(f"Mining service on http://{host}:{port} with {processes} worker processes, jobs up to {job_time_limit:g} seconds")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,37 @@
+"""
+trainedModelExport.py - exports the trained model of AutoDetectType to flattened
+NumPy arrays (features/TrainedModel.npz, see datasetTypeDetection.exportTrainedModel),
+so the type prediction needs no sklearn unpickling. A model retrained after the
+export is used instead of it until the export runs again.
+Usage: python trainedModelExport.py [model file]
+"""
+
+import sys
+import os
+import json
+from joblib import load
+import datasetTypeDetection as df
+
+#------------------------------
+#command line arguments section
+#------------------------------
+
+filepath=os.path.join('features','TrainedModel.joblib')
+if len(sys.argv)>1:
+    if len(sys.argv[1])>0:
+        filepath=sys.argv[1]
+
+#------------------------------
+#end command line arguments section
+#------------------------------
+
+try:
+
+    model=load(filepath)
+    compactpath=os.path.splitext(filepath)[0] + '.npz'
+    df.exportTrainedModel(model, compactpath)
+
+    print(json.dumps({'trees': len(model.estimators_), 'nodes': int(sum(x.tree_.node_count for x in model.estimators_)), 'file': compactpath}))
+
+except Exception as e:
+    print(f"An error occurred: {e}")
@@ -12,6 +12,10 @@
 
 	//Python settings
 	define('PYTHON','python');
+	//Resident association rules mining service (Python/miningService.py). Empty to run Main05.py per request
+	define('MINING_SERVICE','http://127.0.0.1:8765');
+	//Seconds between the polls of a mining job
+	define('MINING_POLL', 0.5);
 	
     //SMTP Settings
     define('smtpHost','smtp.teithe.gr');
@@ -91,6 +91,20 @@
         $message = "Could not find dataset!!!\n";
     }
 
+    //Remove the columnar store of the dataset (a hidden folder next to it)
+    $fpaths_parts = pathinfo($fpath);
+    deleteDir($fpaths_parts['dirname']."/.".$fpaths_parts['basename'].".columns");
+
+    //Remove the transactions cache of the dataset (next to its metadata file)
+    if ($outputType==2) {
+        $fpathc="../Python/output/".$identity."/".$fpaths_parts['filename'].".npz";
+    }else{
+        $fpathc="../Python/output/".$identity."/p/".$fpaths_parts['filename'].".npz";
+    }
+    if (is_file($fpathc)) {
+        unlink($fpathc);
+    }
+
     if ($outputType==2) {
         $fpatho="../Python/output/".$identity."/".$filename;
     }else{
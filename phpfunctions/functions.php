@@ -46,13 +46,66 @@
 		};	
 	};
 
-	function execInBackground($cmd) {
+	//$dir is the working directory of the command, the directory of the calling script is kept
+	function execInBackground($cmd, $dir = null) {
 		if (substr(php_uname(), 0, 7) == "Windows"){
+			if ($dir !== null) {
+				//the empty title keeps the quoted directory from being taken as the window title
+				pclose(popen('start "" /D '.escapeshellarg($dir).' /B '. $cmd, "r"));
+				return;
+			}
 			pclose(popen("start /B ". $cmd, "r")); 
 		}
 		else {
+			if ($dir !== null) {$cmd = 'cd '.escapeshellarg($dir).' && '.$cmd;}
 			exec($cmd . " > /dev/null &");  
 		}
 	} 
 
+	//Submits an association rules mining job to the resident mining service (Python/miningService.py)
+	//and polls it until it ends, the service stops the job after $timeLimit seconds of running and the job
+	//is cancelled when it doesn't end in $timeLimit seconds here. Returns the output of Main05.py or null if the service can't be reached
+	function miningServiceRun($identity, $datasetName, $public, $timeLimit = 1800) {
+		if (!defined('MINING_SERVICE') || MINING_SERVICE == '') {
+			return null;
+		}
+
+		$context = stream_context_create(array('http' => array(
+			'method' => 'POST',
+			'header' => "Content-Type: application/x-www-form-urlencoded\r\n",
+			'content' => http_build_query(array('identity' => $identity, 'datasetName' => $datasetName, 'public' => $public, 'timeLimit' => $timeLimit)),
+			'timeout' => 10,
+			'ignore_errors' => true
+		)));
+		$response = @file_get_contents(MINING_SERVICE.'/jobs', false, $context);
+		if ($response === false) {
+			return null;
+		}
+		$job = json_decode($response, true);
+		if (!isset($job['job'])) {
+			return 'An error occurred: '.(isset($job['error']) ? $job['error'] : 'The mining job was not accepted');
+		}
+
+		$context = stream_context_create(array('http' => array('timeout' => 10, 'ignore_errors' => true)));
+		$start = time();
+		while (time() - $start < $timeLimit) {
+			usleep((int) (MINING_POLL * 1000000));
+			$response = @file_get_contents(MINING_SERVICE.'/jobs/'.$job['job'], false, $context);
+			if ($response === false) {
+				return 'An error occurred: The mining service stopped';
+			}
+			$result = json_decode($response, true);
+			if (isset($result['status']) && in_array($result['status'], array('done', 'error', 'cancelled'))) {
+				return $result['output'];
+			}
+			if (!isset($result['status'])) {
+				return 'An error occurred: The mining job was lost';
+			}
+		}
+		//the job is cancelled, its worker is freed for the next jobs
+		$context = stream_context_create(array('http' => array('method' => 'DELETE', 'timeout' => 10, 'ignore_errors' => true)));
+		@file_get_contents(MINING_SERVICE.'/jobs/'.$job['job'], false, $context);
+		return 'An error occurred: The mining job did not end in '.$timeLimit.' seconds';
+	}
+
 ?>
\ No newline at end of file
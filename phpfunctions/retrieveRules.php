@@ -206,6 +206,18 @@
     if (!empty($_POST['redundantType'])) {
         $json_data['redundantRemoveType'] = (int) $_POST['redundantType'];
     }    
+    // Frequent itemsets algorithm (apriori, fpgrowth, eclat). Kept from the metadata file if not posted
+    if (!empty($_POST['algorithm'])) {
+        $json_data['algorithm'] = (string) $_POST['algorithm'];
+    }
+    // Maximum count of association rules. Kept from the metadata file if not posted
+    if (!empty($_POST['max_rules'])) {
+        $json_data['max_rules'] = (int) $_POST['max_rules'];
+    }
+    // Only the top K rules by ssort (0 = all the rules up to max_rules). Kept from the metadata file if not posted
+    if (isset($_POST['top_k']) && $_POST['top_k'] !== '') {
+        $json_data['top_k'] = (int) $_POST['top_k'];
+    }
     $json_data['participatingItems']="[]"; 
     if (!empty($_POST['extra_parameters'])) {
         // Use a regular expression to match quoted segments
@@ -268,17 +280,24 @@
     // print json_encode($JsonReq);
     // exit();   
 
-    try {
-        set_time_limit(1800); //in seconds
-        ob_start();
-        passthru($input);
-        $output = ob_get_contents();
-        ob_end_clean();
-    } catch (Exception $e) {
-        http_response_code(201);
-        $JsonReq = array('title' => $input.'Error', 'message' => $e->getMessage());
-        print json_encode($JsonReq);
-        exit();
+    set_time_limit(1800); //in seconds
+
+    //The job is run by the resident mining service (Python/miningService.py) and polled.
+    //Without the service, Main05.py runs for this request
+    $output = miningServiceRun($identity, $filename, $isPublic, 1800);
+
+    if ($output === null) {
+        try {
+            ob_start();
+            passthru($input);
+            $output = ob_get_contents();
+            ob_end_clean();
+        } catch (Exception $e) {
+            http_response_code(201);
+            $JsonReq = array('title' => $input.'Error', 'message' => $e->getMessage());
+            print json_encode($JsonReq);
+            exit();
+        }
     }
 
     if (!$output) {
@@ -295,9 +314,9 @@
     }
 
     http_response_code(200);
-    if (substr($output, 0, 1)=='@') {
-        $MaxRules=intval(substr($output, 1, 4));
-        $JsonReq = array('title' => $input, 'message' => substr($output,5), 'error_text'=>"Maximum association rules limit reached!!!($MaxRules). Please try adjusting minimum support, confidence or lift to reduce generated rules.");
+    if (preg_match('/^@(\d+)/', $output, $matches)) {
+        $MaxRules=intval($matches[1]);
+        $JsonReq = array('title' => $input, 'message' => substr($output,strlen($matches[0])), 'error_text'=>"Maximum association rules limit reached!!!($MaxRules). Please try adjusting minimum support, confidence or lift to reduce generated rules.");
     }
     else {
         $JsonReq = array('title' => $input, 'message' => $output);
@@ -148,6 +148,12 @@
         
         if ($isPublic) {copy($target_file, $targetPbl_file);};
 
+        //Write the columnar store of the dataset in the background, so its later reads skip the text parsing.
+        //The job runs in the Python folder, the working directory of this script is kept
+        $storeArgs = ' datasetStore.py '.escapeshellarg($identity).' '.escapeshellarg(basename($_FILES["fileToUpload"]["name"]));
+        execInBackground(PYTHON.$storeArgs.' 0', '../Python');
+        if ($isPublic) {execInBackground(PYTHON.$storeArgs.' 1', '../Python');};
+
         http_response_code(200);
         $JsonReq = array('title' => 'Information', 'message' => 'File stored successfully.');
         print json_encode($JsonReq);